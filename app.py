@@ -1,9 +1,14 @@
 
 import streamlit as st
+import altair as alt
 import pandas as pd
-import joblib
 from datetime import timedelta, datetime
+from forecast import forecast_frame, initial_windows, load_models, next_day_features
+from history import TREND_COLUMNS, TREND_MONTHS, History, anomalies, load_aggregates
+from manifest import version
+from metrics import set_job, stage
 from preprocess import WEATHER_CODE_MAP
+from store import FEATURES_TABLE, read_table
 
 # ---------- Custom CSS for Minimal Look and Weather Theme ----------
 st.markdown(
@@ -33,71 +38,68 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# ---------- Load Models and Data ----------
-model_temp = joblib.load("model_temperature.pkl")
-model_precip = joblib.load("model_precipitation.pkl")
-model_code = joblib.load("model_weather_code.pkl")
-feature_cols = joblib.load("features.pkl")
-
-df = pd.read_csv("preprocessed_weather.csv", parse_dates=["date"])
-# Make sure 'date' is timezone-naive and normalized
-df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None).dt.normalize()
-
-# ---------- Helper: Recursive Forecasting Function ----------
-def recursive_forecast(days_ahead, base_row):
-    forecasts = []
-    current_features = base_row.copy()
-
-    for day in range(days_ahead):
-        # Predict using the features (ensuring we select only training features)
-        temp_pred = model_temp.predict(current_features[feature_cols])[0]
-        precip_pred = model_precip.predict(current_features[feature_cols])[0]
-        code_pred = model_code.predict(current_features[feature_cols])[0]
-
-        # Map weather code to description
-        weather_desc = WEATHER_CODE_MAP.get(int(code_pred), "Unknown")
-
-        # Calculate forecast date (using .iloc[0] to get a pandas Timestamp)
-        forecast_date = current_features["date"].iloc[0] + timedelta(days=1)
-
-        # Store forecast for the day
-        forecasts.append({
-            "date": forecast_date,
-            "temperature_2m_mean": temp_pred,
-            "precipitation_sum": precip_pred,
-            "weather_code": code_pred,
-            "weather_description": weather_desc
-        })
-
-        # Update current_features for next iteration:
-        # For each key feature, shift lag features by one.
-        for feature in ["temperature_2m_mean", "precipitation_sum", "weather_code"]:
-            for lag in range(7, 1, -1):
-                col_current = f"{feature}_lag{lag}"
-                col_previous = f"{feature}_lag{lag-1}"
-                if col_previous in current_features.columns and col_current in current_features.columns:
-                    current_features[col_current] = current_features[col_previous]
-            # Set lag1 to predicted value
-            current_features[f"{feature}_lag1"] = temp_pred if feature=="temperature_2m_mean" else \
-                                                  precip_pred if feature=="precipitation_sum" else \
-                                                  code_pred
-        # Update the date in current_features for the next iteration
-        current_features["date"] = forecast_date
-
-    return pd.DataFrame(forecasts)
+# ---------- Load Models and Data (cached per artifact version) ----------
+# The versions come from manifest.json, which the pipeline updates whenever it writes
+# new data or models; a new version misses the caches, so they reload automatically.
+# Each cache miss is timed as a stage (see metrics.py); hits cost nothing.
+set_job("app")
+
+
+@st.cache_resource(max_entries=1)
+def get_models(model_version):
+    with stage("app_load_models"):
+        return load_models()
+
+
+@st.cache_resource(max_entries=1)
+def get_data(data_version):
+    with stage("app_load_data") as record:
+        df = read_table(FEATURES_TABLE)
+        # Make sure 'date' is timezone-naive and normalized
+        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None).dt.normalize()
+        record["rows"] = len(df)
+        return df
+
+
+# Date index and climatology/trend aggregates; the aggregates are persisted per data version
+@st.cache_resource(max_entries=1)
+def get_history(data_version):
+    with stage("app_history"):
+        df = get_data(data_version)
+        return History(df), load_aggregates(df, data_version)
+
+
+# Forecasts memoized by (latest data date, horizon, versions); least recently used entries are evicted
+@st.cache_data(max_entries=64)
+def get_forecast(latest_date, horizon, model_version, data_version):
+    models, feature_cols = get_models(model_version)
+    with stage("app_forecast"):
+        return forecast_frame(models, feature_cols, get_data(data_version), horizon=horizon, probabilistic=True)
+
+
+@st.cache_data(max_entries=4)
+def get_input_features(model_version, data_version):
+    _, feature_cols = get_models(model_version)
+    windows, _ = initial_windows(get_data(data_version))
+    return next_day_features(feature_cols, windows)
+
+
+model_version = version(["models"])
+data_version = version([FEATURES_TABLE])
+history, aggregates = get_history(data_version)
 
 # ---------- Streamlit App UI ----------
 st.title("🌤️ Kerala Weather Forecast Dashboard")
 st.caption("A minimal dashboard for historical and future weather forecasting.")
 
 # Define forecast range
-latest_date = df["date"].max().date()
+latest_date = history.max_date.date()
 max_predict_date = latest_date + timedelta(days=7)
 
 # Date input: user can select any date from historical to 7 days in the future
 selected_date = st.date_input(
     "Select a date for weather details:",
-    min_value=df["date"].min().date(),
+    min_value=history.min_date.date(),
     max_value=max_predict_date,
     value=latest_date  # default to latest date
 )
@@ -106,7 +108,7 @@ selected_date = pd.to_datetime(selected_date).tz_localize(None).normalize()
 # ---------- Display Historical Data or Forecast ----------
 if selected_date <= pd.Timestamp(latest_date):
     st.subheader(f"📖 Historical Weather on {selected_date.date()}")
-    historical_row = df[df["date"] == selected_date]
+    historical_row = history.row(selected_date)
     if not historical_row.empty:
         st.metric("🌡️ Temperature (°C)", round(historical_row["temperature_2m_mean"].values[0], 2))
         st.metric("🌧️ Precipitation (mm)", round(historical_row["precipitation_sum"].values[0], 2))
@@ -116,6 +118,16 @@ if selected_date <= pd.Timestamp(latest_date):
             st.dataframe(historical_row.T)
     else:
         st.warning("No historical data available for this date.")
+
+    # ---------- Trends and Anomalies (precomputed, see history.py) ----------
+    st.subheader("📈 Climate Context")
+    recent = anomalies(history.range(selected_date - timedelta(days=89), selected_date), aggregates["climatology"])
+    st.caption("Departure from the day-of-year average, last 90 days")
+    st.line_chart(recent.set_index("date")[[f"{col}_anomaly" for col in TREND_COLUMNS]])
+    st.caption(f"{TREND_MONTHS}-month rolling mean")
+    temperature_col, precipitation_col = st.columns(2)
+    temperature_col.line_chart(aggregates["trend"].set_index("month")[TREND_COLUMNS[0]])
+    precipitation_col.line_chart(aggregates["trend"].set_index("month")[TREND_COLUMNS[1]])
 else:
     st.subheader(f"📊 Forecast for {selected_date.date()}")
     # Calculate how many days ahead we are forecasting
@@ -123,11 +135,24 @@ else:
     st.write(f"Forecasting {days_ahead} day(s) into the future, using the latest data from {latest_date}.")
 
     # Get the latest row (base row) for recursive forecasting
-    base_row = df[df["date"] == pd.Timestamp(latest_date)]
+    base_row = history.row(latest_date)
     if base_row.empty:
         st.error("No historical data available for the latest date.")
     else:
-        forecast_df = recursive_forecast(days_ahead, base_row)
-        st.dataframe(forecast_df)
+        # Batched recursive forecast from the last days of history (see forecast.py)
+        forecast_df = get_forecast(latest_date, days_ahead, model_version, data_version)
+        st.dataframe(forecast_df[["date", "temperature_2m_mean", "precipitation_sum",
+                                  "weather_code", "weather_description", "precipitation_prob_10mm"]])
+
+        # 10th-90th percentile bands from the per-tree forecast trajectories
+        st.caption("Shaded: 80% prediction interval")
+        temperature_col, precipitation_col = st.columns(2)
+        for column, target, title in ((temperature_col, "temperature_2m_mean", "🌡️ Temperature (°C)"),
+                                      (precipitation_col, "precipitation_sum", "🌧️ Precipitation (mm)")):
+            base = alt.Chart(forecast_df).encode(x=alt.X("date:T", title=None))
+            band = base.mark_area(opacity=0.3).encode(y=alt.Y(f"{target}_q10:Q", title=title),
+                                                      y2=f"{target}_q90:Q")
+            column.altair_chart(band + base.mark_line(point=True).encode(y=f"{target}:Q"),
+                                width="stretch")
         with st.expander("🔍 View Final Input Features for Forecasting"):
-            st.dataframe(base_row[feature_cols].T)
+            st.dataframe(get_input_features(model_version, data_version).T)
@@ -0,0 +1,257 @@
+# artifacts.py
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor
+from store import current_version, new_version, publish_version, read_current
+
+# Compact model format: every tree of a forest flattened into shared node arrays,
+# one .npy file per array so they can be memory-mapped and shared between processes.
+#   compact_models/<model>/v-<id>/{feature,threshold,left,right,value,roots}.npy (+ classes.npy),
+# where compact_models/<model>/CURRENT names the current version (see store.py)
+COMPACT_ROOT = "compact_models"
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+# Forests whose prediction is the mean over their trees; other models stay joblib-only
+FORESTS = (RandomForestRegressor, RandomForestClassifier, ExtraTreesRegressor, ExtraTreesClassifier)
+
+
+class CompactForest:
+    # Vectorized predictor over the flattened node arrays of a forest
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = arrays.get("classes")
+        self.kind = meta["kind"]
+        self.max_depth = meta["max_depth"]
+        self.n_estimators = len(self.roots)
+        self.n_features_in_ = meta["n_features"]
+
+    def apply(self, X):
+        # Leaf node of every (tree, row) pair. All pairs walk down together, one tree level
+        # per step; pairs drop out of the active set once they sit on a leaf
+        X = np.asarray(X, dtype=np.float32)
+        n_rows = len(X)
+        nodes = np.repeat(np.asarray(self.roots, dtype=np.intp), n_rows)
+        rows = np.tile(np.arange(n_rows), self.n_estimators)
+        active = np.arange(len(nodes))
+        for _ in range(self.max_depth + 1):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = following
+            active = active[following != current]
+        return nodes.reshape(self.n_estimators, n_rows)
+
+    def predict_trees(self, X):
+        # Per-tree outputs: (trees, rows) for regressors, (trees, rows, classes) for classifiers
+        values = self.value[self.apply(X)]
+        return values[..., 0] if self.kind == "regressor" else values
+
+    def predict_members(self, X, trees):
+        # Output of tree trees[i] for row i (its vote for classifiers): one walk per row
+        # instead of every tree for every row
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.asarray(self.roots, dtype=np.intp)[trees]
+        active = np.arange(len(X))
+        for _ in range(self.max_depth + 1):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            go_left = X[active, self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = following
+            active = active[following != current]
+        values = self.value[nodes]
+        return values[:, 0] if self.kind == "regressor" else self.classes_[np.argmax(values, axis=1)]
+
+    def predict_proba(self, X):
+        return self.predict_trees(X).mean(axis=0)
+
+    def predict(self, X):
+        if self.kind == "regressor":
+            return self.predict_trees(X).mean(axis=0)
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def is_forest(model):
+    return isinstance(model, FORESTS)
+
+
+def flatten_forest(model):
+    # Concatenate the node arrays of all trees; leaves point to themselves so a
+    # fixed number of traversal steps always ends on a leaf
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        nodes = np.arange(tree.node_count)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+        tree_value = tree.value[:, 0, :]
+        if hasattr(model, "classes_"):
+            tree_value = tree_value / tree_value.sum(axis=1, keepdims=True)
+        value.append(tree_value)
+        roots.append(offset)
+        offset += tree.node_count
+
+    arrays = {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        # Class fractions fit in float32; regression leaves keep full precision
+        "value": np.concatenate(value).astype(np.float32 if hasattr(model, "classes_") else np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        "kind": "classifier" if hasattr(model, "classes_") else "regressor",
+        "max_depth": int(max(e.tree_.max_depth for e in model.estimators_)),
+        "n_features": int(model.n_features_in_),
+    }
+    if hasattr(model, "classes_"):
+        arrays["classes"] = np.asarray(model.classes_)
+    return arrays, meta
+
+
+def export_model(model, name, root=COMPACT_ROOT):
+    # Write a new version directory and switch the pointer to it, so loaders never see a
+    # partial or missing model
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    previous = current_version(path)
+    version_path = new_version(path)
+    arrays, meta = flatten_forest(model)
+    for key, array in arrays.items():
+        np.save(os.path.join(version_path, f"{key}.npy"), array)
+    with open(os.path.join(version_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    publish_version(path, version_path, previous)
+
+
+def compact_exists(name, root=COMPACT_ROOT):
+    return os.path.exists(os.path.join(current_version(os.path.join(root, name)), "meta.json"))
+
+
+def load_compact(name, root=COMPACT_ROOT, mmap_mode="r"):
+    # Every array comes from the same export, even while a new one is published
+    return read_current(os.path.join(root, name), lambda path: _load_version(path, mmap_mode))
+
+
+def _load_version(path, mmap_mode):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    # Plain ndarray views of the mapped files: same shared pages, without np.memmap's
+    # per-indexing overhead
+    arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mmap_mode).view(np.ndarray)
+              for key in NODE_ARRAYS}
+    if meta["kind"] == "classifier":
+        arrays["classes"] = np.load(os.path.join(path, "classes.npy"))
+    return CompactForest(arrays, meta)
+
+
+def remove_compact(name, root=COMPACT_ROOT):
+    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def export_models(models, root=COMPACT_ROOT):
+    for name, model in models.items():
+        if is_forest(model):
+            export_model(model, name, root)
+        else:
+            # Loaded from its pickle instead; drop the export of an earlier forest
+            remove_compact(name, root)
+    print(f"✅ Compact models exported to '{root}'")
+
+
+# ---------- Comparison against the joblib pickles ----------
+def _private_rss_mb():
+    # Anonymous (non-shareable) resident memory; memory-mapped model pages are file-backed
+    # and shared between processes, so they are not counted here
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(fmt, queue):
+    # Runs in a fresh process so load time and memory are not shared between formats
+    import joblib
+    from train_model import MODELS
+
+    n_features = len(joblib.load("features.pkl"))
+    rss_before = _private_rss_mb()
+    start = time.perf_counter()
+    if fmt == "joblib":
+        models = {name: joblib.load(path) for name, (_, path) in MODELS.items()}
+    else:
+        models = {name: load_compact(name) for name in MODELS}
+    load_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    single = rng.normal(size=(1, n_features)).astype(np.float32)
+    batch = rng.normal(size=(1000, n_features)).astype(np.float32)
+    latencies = {}
+    for label, X in (("single", single), ("batch", batch)):
+        for model in models.values():
+            model.predict(X)  # warm-up
+        times = []
+        for _ in range(20):
+            start = time.perf_counter()
+            for model in models.values():
+                model.predict(X)
+            times.append(time.perf_counter() - start)
+        latencies[label] = float(np.median(times)) * 1000
+    queue.put({
+        "format": fmt,
+        "load_ms": load_seconds * 1000,
+        "private_rss_mb": _private_rss_mb() - rss_before,
+        "predict_1_row_ms": latencies["single"],
+        "predict_1000_rows_ms": latencies["batch"],
+    })
+
+
+def compare_formats():
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for fmt in ("joblib", "compact"):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(fmt, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"{'format':<8} {'load ms':>9} {'private RSS MB':>15} {'1 row ms':>9} {'1000 rows ms':>13}")
+    for r in results:
+        print(f"{r['format']:<8} {r['load_ms']:>9.1f} {r['private_rss_mb']:>15.1f} "
+              f"{r['predict_1_row_ms']:>9.2f} {r['predict_1000_rows_ms']:>13.2f}")
+    return results
+
+if __name__ == "__main__":
+    import sys
+    if "--compare" in sys.argv:
+        compare_formats()
+    else:
+        import joblib
+        from train_model import MODELS
+        export_models({name: joblib.load(path) for name, (_, path) in MODELS.items()})
@@ -0,0 +1,209 @@
+# backtest.py
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from features import LAG_FEATURES, history_days
+from forecast import forecast
+from metrics import instrumented, set_rows
+from train_model import MODELS, load_training_data, new_model, pool_context, selected_backend
+
+# Rolling-origin (walk-forward) backtesting. For each cutoff date the selected backends
+# are trained on rows up to the cutoff only, then forecast horizons 1..HORIZON from every
+# base date of the following STEP_DAYS, using the recursive forecast engine. Folds run
+# in a process pool that shares the feature matrix, targets and forecast windows
+# through shared memory. Per (cutoff, horizon) error sums are cached in BACKTEST_PATH,
+# so a rerun only computes cutoffs it has not seen.
+BACKTEST_PATH = "backtest_results.parquet"
+HORIZON = 7
+STEP_DAYS = 30          # spacing of cutoffs and length of each fold's evaluation window
+MIN_TRAIN_DAYS = 3650   # history needed before the first cutoff
+N_CUTOFFS = 24          # most recent cutoffs evaluated by default
+CPU_SHARE = 0.5         # default workers, as a share of the cores: leave room for serving
+
+_shared = {}
+
+
+def config_key(backends, feature_cols):
+    # Cached folds are reused only under the same backends, features and fold layout
+    config = {"backends": backends, "features": feature_cols, "horizon": HORIZON, "step": STEP_DAYS}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def cutoff_positions(dates, n_cutoffs=N_CUTOFFS):
+    # Cutoffs every STEP_DAYS from a fixed anchor (the first day plus MIN_TRAIN_DAYS), so
+    # they stay the same as the history grows; only folds whose whole evaluation window
+    # (plus the horizon) has been observed
+    n_rows = len(dates)
+    positions = np.arange(MIN_TRAIN_DAYS, n_rows - STEP_DAYS - HORIZON + 1, STEP_DAYS)
+    return positions[-n_cutoffs:] if n_cutoffs else positions
+
+
+# ---------- Shared memory ----------
+def _share(arrays):
+    # Copy arrays into shared memory blocks; returns the blocks and how to attach them
+    blocks, specs = [], {}
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[key] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs):
+    # Worker initializer: numpy views on the parent's blocks, no copies
+    for key, (name, shape, dtype) in specs.items():
+        if sys.version_info >= (3, 13):
+            # Only the parent, which unlinks the blocks, tracks them
+            block = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Workers share the parent's resource tracker, which keeps one entry per
+            # block: the parent's unlink clears this registration too, and unregistering
+            # here would make that unlink fail in the tracker
+            block = shared_memory.SharedMemory(name=name)
+        _shared[key] = (block, np.ndarray(shape, np.dtype(dtype), buffer=block.buf))
+
+
+def _array(key):
+    return _shared[key][1]
+
+
+# ---------- One fold ----------
+def run_fold(cutoff, base_start, feature_cols, backends, n_jobs=1):
+    # Train on rows [0, cutoff], forecast from bases cutoff .. cutoff + STEP_DAYS - 1;
+    # returns one record per (model, horizon) with error sums over the fold
+    X = _array("X")
+    models = {}
+    for name in MODELS:
+        y = _array(name)
+        model = new_model(name, y[:cutoff + 1], n_jobs=n_jobs, backend=backends[name])
+        models[name] = model.fit(X[:cutoff + 1], y[:cutoff + 1])
+
+    bases = cutoff + np.arange(STEP_DAYS)
+    windows = _array("windows")[bases - base_start].copy()
+    preds = forecast(models, feature_cols, windows, HORIZON)
+
+    records = []
+    for name in MODELS:
+        # Actual value of each (base, horizon): the row `horizon` days after the base
+        actual = _array(name)[bases[:, None] + np.arange(1, HORIZON + 1)]
+        errors = preds[name] - actual
+        for h in range(HORIZON):
+            record = {"model": name, "horizon": h + 1, "n": len(bases)}
+            if name == "weather_code":
+                record["correct"] = int((np.rint(preds[name][:, h]) == actual[:, h]).sum())
+            else:
+                record["sse"] = float((errors[:, h] ** 2).sum())
+                record["sae"] = float(np.abs(errors[:, h]).sum())
+            records.append(record)
+    return cutoff, records
+
+
+# ---------- Cache and summary ----------
+def read_results(path=BACKTEST_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["config", "cutoff", "model", "horizon", "n", "sse", "sae", "correct"])
+    return pd.read_parquet(path)
+
+
+def write_results(results, path=BACKTEST_PATH):
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    results.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def summarize(results):
+    # Pooled error per model and horizon over all cutoffs
+    grouped = results.groupby(["model", "horizon"])
+    summary = grouped[["n", "sse", "sae", "correct"]].sum(min_count=1)
+    summary["folds"] = grouped.size()
+    summary["rmse"] = np.sqrt(summary["sse"] / summary["n"])
+    summary["mae"] = summary["sae"] / summary["n"]
+    summary["accuracy"] = summary["correct"] / summary["n"]
+    return summary[["folds", "n", "rmse", "mae", "accuracy"]].reset_index()
+
+
+def print_summary(summary):
+    for name in MODELS:
+        rows = summary[summary["model"] == name].sort_values("horizon")
+        if name == "weather_code":
+            scores = "  ".join(f"h{r.horizon} {r.accuracy * 100:.1f}%" for r in rows.itertuples())
+        else:
+            scores = "  ".join(f"h{r.horizon} {r.rmse:.2f}" for r in rows.itertuples())
+        metric = "accuracy" if name == "weather_code" else "RMSE"
+        print(f"📊 {name} {metric}: {scores}")
+
+
+@instrumented("backtest")
+def run_backtest(n_cutoffs=N_CUTOFFS, backends=None, max_workers=None, path=BACKTEST_PATH):
+    df, feature_cols, X, targets = load_training_data()
+    if "station" in df.columns:
+        raise ValueError("Backtesting expects the single-station feature table")
+    dates = pd.DatetimeIndex(df["date"]).tz_localize(None)
+    if (np.diff(dates.to_numpy()) != np.timedelta64(1, "D")).any():
+        raise ValueError("Backtesting needs consecutive daily rows")
+    backends = backends or {name: selected_backend(name) for name in MODELS}
+    key = config_key(backends, feature_cols)
+
+    cached = read_results(path)
+    done = set(pd.to_datetime(cached.loc[cached["config"] == key, "cutoff"]))
+    positions = [p for p in cutoff_positions(dates, n_cutoffs) if dates[p] not in done]
+    if len(positions) == 0:
+        print("✅ All cutoffs already backtested")
+    else:
+        print(f"🔁 Backtesting {len(positions)} new cutoff(s) "
+              f"({len(done)} cached), horizons 1-{HORIZON}")
+        set_rows(len(positions) * STEP_DAYS)
+
+        # Forecast windows of every base date of the new folds, built once
+        history = history_days()
+        base_start = positions[0]
+        bases = np.arange(base_start, positions[-1] + STEP_DAYS)
+        values = df[LAG_FEATURES].to_numpy(dtype=np.float32)
+        windows = values[(bases - history + 1)[:, None] + np.arange(history)].transpose(0, 2, 1)
+
+        arrays = {"X": X, "windows": windows}
+        arrays.update({name: y.astype(np.float64) for name, y in targets.items()})
+        blocks, specs = _share(arrays)
+        new_records = []
+        try:
+            max_workers = max_workers or max(1, int((os.cpu_count() or 1) * CPU_SHARE))
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context(),
+                                     initializer=_attach, initargs=(specs,)) as pool:
+                futures = [pool.submit(run_fold, p, base_start, feature_cols, backends) for p in positions]
+                for future in futures:
+                    cutoff, records = future.result()
+                    for record in records:
+                        record.update(config=key, cutoff=dates[cutoff])
+                    new_records += records
+                    print(f"✅ Cutoff {dates[cutoff].date()} done")
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        fresh = pd.DataFrame(new_records)
+        cached = fresh if cached.empty else pd.concat([cached, fresh], ignore_index=True)
+        write_results(cached, path)
+
+    results = cached[cached["config"] == key]
+    summary = summarize(results)
+    print_summary(summary)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the selected models.")
+    parser.add_argument("--cutoffs", type=int, default=N_CUTOFFS, help="most recent cutoffs to evaluate (0 = all)")
+    parser.add_argument("--backend", help="evaluate this backend for every target instead of the selection")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    run_backtest(args.cutoffs, {name: args.backend for name in MODELS} if args.backend else None, args.workers)
@@ -0,0 +1,212 @@
+# benchmark.py
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sklearn
+from features import LAG_FEATURES, history_days
+from fetch_data import response_to_dataframe
+from synthetic import HISTORY_YEARS, SyntheticResponse, synthetic_history
+
+# Reproducible benchmarks of every pipeline stage on synthetic data.
+# Each run works in a scratch directory (store, models, state files), records wall
+# time (and optionally peak traced memory) per stage, writes RESULTS_PATH and compares against
+# BASELINE_PATH.
+BASELINE_PATH = "benchmark_baseline.json"
+RESULTS_PATH = "benchmark_results.json"
+STAGES = ["parse", "preprocess", "train", "predict", "forecast", "cold_start"]
+HORIZONS = range(1, 8)
+
+# A stage regresses when it is this much slower than the baseline, and by more
+# than the noise floor
+TOLERANCE = 1.25
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def measure(func, *args, trace_memory=False, **kwargs):
+    # Wall time of one call, with stage output muted. tracemalloc slows allocation-heavy
+    # code, so peak traced memory is only recorded when asked for.
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _cold_start(queue):
+    # Runs in a fresh process: what the dashboard does on its first script run
+    from forecast import load_models
+    from store import FEATURES_TABLE, read_table
+
+    start = time.perf_counter()
+    load_models()
+    read_table(FEATURES_TABLE)
+    queue.put(time.perf_counter() - start)
+
+
+def measure_cold_start():
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_cold_start, args=(queue,))
+    process.start()
+    seconds = queue.get()
+    process.join()
+    return seconds
+
+
+def run_scale(scale, stages, trace_memory=False, years=HISTORY_YEARS):
+    from forecast import forecast_frame, load_models
+    from predict import predict_next_day
+    from preprocess import preprocess_weather_data
+    from store import FEATURES_TABLE, HISTORY_TABLE, read_table, write_table
+    from train_model import train_models
+
+    history = synthetic_history(scale, years=years)
+    rows = len(history)
+    results = []
+
+    def add(stage, seconds, peak_mb=None):
+        results.append({
+            "stage": stage,
+            "scale": scale,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "peak_mb": None if peak_mb is None else round(peak_mb, 1),
+            "rows_per_second": round(rows / seconds) if seconds > 0 else None,
+        })
+        print(f"  {stage:<14} {seconds:>9.3f}s" + ("" if peak_mb is None else f" {peak_mb:>9.1f} MB"))
+
+    if "parse" in stages:
+        groups = [group.drop(columns="station") for _, group in history.groupby("station")] \
+            if "station" in history.columns else [history]
+        responses = [SyntheticResponse(group) for group in groups]
+        _, seconds, peak = measure(lambda: [response_to_dataframe(r) for r in responses], trace_memory=trace_memory)
+        add("parse", seconds, peak)
+
+    write_table(history, HISTORY_TABLE)
+    if len({"preprocess", "train", "predict", "forecast", "cold_start"} & set(stages)) > 0:
+        features, seconds, peak = measure(preprocess_weather_data, trace_memory=trace_memory)
+        # Every station loses only its first history_days() rows to the lags; anything
+        # else means the stage was fed mis-ordered rows and the timings are meaningless
+        stations = history["station"].nunique() if "station" in history.columns else 1
+        expected = rows - stations * history_days()
+        if len(features) != expected:
+            raise RuntimeError(f"preprocess kept {len(features)} feature rows, expected {expected}")
+        if "preprocess" in stages:
+            add("preprocess", seconds, peak)
+
+    if len({"train", "predict", "forecast", "cold_start"} & set(stages)) > 0:
+        # Training runs in worker processes, so only the parent's memory is traced
+        _, seconds, peak = measure(train_models, trace_memory=trace_memory)
+        if "train" in stages:
+            add("train", seconds, peak)
+
+    if "predict" in stages:
+        _, seconds, peak = measure(predict_next_day, trace_memory=trace_memory)
+        add("predict", seconds, peak)
+
+    if "forecast" in stages:
+        models, feature_cols = load_models()
+        latest = read_table(FEATURES_TABLE, columns=[c for c in ["station", "date"] if c in history.columns]
+                            + LAG_FEATURES)
+        latest = latest.groupby("station", sort=False).tail(history_days()) if "station" in latest.columns \
+            else latest.tail(history_days())
+        for horizon in HORIZONS:
+            _, seconds, peak = measure(forecast_frame, models, feature_cols, latest, horizon=horizon,
+                                            trace_memory=trace_memory)
+            add(f"forecast_h{horizon}", seconds, peak)
+
+    if "cold_start" in stages:
+        add("cold_start", measure_cold_start())
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Matched on stage, scale and row count, so runs with a different --years are not compared
+    reference = {(r["stage"], r["scale"], r["rows"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"{'stage':<14} {'scale':>5} {'seconds':>9} {'baseline':>9} {'ratio':>6}")
+    for r in results:
+        base = reference.get((r["stage"], r["scale"], r["rows"]))
+        if base is None:
+            print(f"{r['stage']:<14} {r['scale']:>5} {r['seconds']:>9.3f} {'-':>9} {'-':>6}")
+            continue
+        ratio = r["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+        regressed = ratio > tolerance and r["seconds"] - base["seconds"] > NOISE_FLOOR_SECONDS
+        flag = " ⚠️ regression" if regressed else ""
+        print(f"{r['stage']:<14} {r['scale']:>5} {r['seconds']:>9.3f} {base['seconds']:>9.3f} {ratio:>6.2f}{flag}")
+        if regressed:
+            regressions.append(r)
+    return regressions
+
+
+def run_benchmarks(scales=(1,), stages=STAGES, trace_memory=False, years=HISTORY_YEARS):
+    meta = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+        "years": years,
+    }
+    results = []
+    cwd = os.getcwd()
+    for scale in scales:
+        # A scratch directory per scale: every stage reads and writes relative paths
+        workdir = tempfile.mkdtemp(prefix=f"weather-bench-{scale}x-")
+        try:
+            os.chdir(workdir)
+            print(f"📏 Scale {scale}x")
+            results += run_scale(scale, stages, trace_memory, years)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {"meta": meta, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the weather pipeline on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1],
+                        help="multiples of the 85-year history (above 1x spread over that many stations)")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--years", type=float, default=HISTORY_YEARS,
+                        help="years of history per station (shorter for quick smoke runs)")
+    parser.add_argument("--memory", action="store_true", help="also record peak traced memory (slower)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scales, args.stages, args.memory, args.years)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to '{args.output}'")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to '{args.baseline}'")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,148 @@
+# features.py
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Features that get lagged and rolling-window copies
+LAG_FEATURES = [
+    "temperature_2m_mean", "temperature_2m_max",
+    "relative_humidity_2m_mean", "precipitation_sum", "weather_code",
+    "wind_speed_10m_mean", "wind_gusts_10m_mean", "surface_pressure_mean",
+    "daylight_duration", "sunshine_duration", "dew_point_2m_mean",
+    "cloud_cover_mean", "pressure_msl_mean"
+]
+
+# Default engine configuration: lags 1..7 and 7/30-day windows over past values
+LAGS = tuple(range(1, 8))
+ROLLING_WINDOWS = (7, 30)
+ROLLING_STATS = ("mean", "min", "max", "sum")
+
+# Working-set budget for build_features; the output frame itself is extra
+MEMORY_BUDGET_MB = 256
+
+
+# Feature definitions for the row of day t, from the values of the days before it:
+#   {col}_lag{k}          value on day t-k
+#   {col}_roll{w}_{stat}  stat over days t-w .. t-1
+def feature_names(columns=LAG_FEATURES, lags=LAGS, windows=ROLLING_WINDOWS, stats=ROLLING_STATS):
+    names = []
+    for col in columns:
+        names += [f"{col}_lag{k}" for k in lags]
+        names += [f"{col}_roll{w}_{stat}" for w in windows for stat in stats]
+    return names
+
+
+def history_days(lags=LAGS, windows=ROLLING_WINDOWS):
+    # Number of past days needed to compute the features of one day
+    return max(max(lags, default=0), max(windows, default=0))
+
+
+def window_features(window, lags=LAGS, windows=ROLLING_WINDOWS, stats=ROLLING_STATS, sums=None):
+    # window: (rows, columns, history_days) of past values, oldest first.
+    # Returns (rows, columns, features per column) float32, ordered as feature_names().
+    n_rows, n_cols, history = window.shape
+    per_col = len(lags) + len(windows) * len(stats)
+    out = np.empty((n_rows, n_cols, per_col), dtype=np.float32)
+
+    # All lags for all columns in one gather
+    out[:, :, :len(lags)] = window[:, :, history - np.asarray(lags, dtype=np.intp)]
+
+    pos = len(lags)
+    for w in windows:
+        recent = window[:, :, history - w:]
+        window_sum = sums[w] if sums is not None else recent.sum(axis=2, dtype=np.float64)
+        for stat in stats:
+            if stat == "sum":
+                out[:, :, pos] = window_sum
+            elif stat == "mean":
+                out[:, :, pos] = window_sum / w
+            elif stat == "min":
+                out[:, :, pos] = recent.min(axis=2)
+            elif stat == "max":
+                out[:, :, pos] = recent.max(axis=2)
+            else:
+                raise ValueError(f"Unknown rolling statistic '{stat}'")
+            pos += 1
+    return out
+
+
+def _series_features(values, out, lags, windows, stats, chunk_rows):
+    # values: (T, C) float32 series of one station, out: (T, C, per_col) view to fill
+    history = history_days(lags, windows)
+    n_rows, n_cols = values.shape
+    padded = np.concatenate([np.full((history, n_cols), np.nan, dtype=np.float32), values])
+
+    for start in range(0, n_rows, chunk_rows):
+        end = min(start + chunk_rows, n_rows)
+        # padded[start : end + history] holds the past `history` days of every row in the chunk
+        block = padded[start:end + history]
+        view = sliding_window_view(block, history, axis=0)[:end - start]
+
+        # Rolling sums from one cumulative sum per chunk; NaNs are counted separately
+        # so a window containing a missing value stays missing (as pandas rolling does)
+        filled = np.nan_to_num(block, nan=0.0).astype(np.float64)
+        csum = np.vstack([np.zeros((1, n_cols)), np.cumsum(filled, axis=0)])
+        cnan = np.vstack([np.zeros((1, n_cols)), np.cumsum(np.isnan(block), axis=0)])
+        sums = {}
+        for w in windows:
+            hi = np.arange(history, history + end - start)
+            window_sum = csum[hi] - csum[hi - w]
+            window_sum[(cnan[hi] - cnan[hi - w]) > 0] = np.nan
+            sums[w] = window_sum
+
+        out[start:end] = window_features(view, lags, windows, stats, sums=sums)
+
+
+def build_features(df, columns=LAG_FEATURES, lags=LAGS, windows=ROLLING_WINDOWS, stats=ROLLING_STATS,
+                   memory_budget_mb=MEMORY_BUDGET_MB):
+    # Vectorized lag and rolling-window features for every row of `df` (sorted by date,
+    # and by station first if there is a station column). Returns a float32 frame.
+    names = feature_names(columns, lags, windows, stats)
+    per_col = len(lags) + len(windows) * len(stats)
+    out = np.empty((len(df), len(columns), per_col), dtype=np.float32)
+
+    # Rows per chunk so the lag copies, cumulative sums and window reductions fit the budget
+    history = history_days(lags, windows)
+    bytes_per_row = len(columns) * (per_col * 4 + 3 * 8 + (history + 1) * 4)
+    chunk_rows = max(1, int(memory_budget_mb * 2**20 // bytes_per_row))
+
+    values = df[columns].to_numpy(dtype=np.float32)
+    if "station" in df.columns:
+        codes = pd.factorize(df["station"])[0]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        segments = zip(np.r_[0, bounds], np.r_[bounds, len(df)])
+    else:
+        segments = [(0, len(df))]
+    for lo, hi in segments:
+        _series_features(values[lo:hi], out[lo:hi], lags, windows, stats, chunk_rows)
+
+    return pd.DataFrame(out.reshape(len(df), -1), columns=names, index=df.index)
+
+
+def compact_dtypes(df):
+    # float64 -> float32 and text -> category
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]) and df[col].dtype != np.float32:
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def wide_memory_mb(df):
+    # What `df` would take with the default float64/object dtypes
+    total = df.index.memory_usage(deep=True)
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            total += len(df) * 8
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            total += df[col].astype(object).memory_usage(deep=True, index=False)
+        else:
+            total += df[col].memory_usage(deep=True, index=False)
+    return total / 2**20
@@ -2,31 +2,110 @@ import openmeteo_requests
 
 import requests_cache
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from requests.adapters import HTTPAdapter
 from retry_requests import retry
+from metrics import instrumented, record_response
+from store import HISTORY_TABLE, STATIONS_TABLE, append_table, latest_date, latest_dates, write_table
 
-def fetch_weather_data():
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+HISTORY_START = "1940-12-31"
 
+# Kochi, the station the models are trained on
+LATITUDE = 9.9399
+LONGITUDE = 76.2602
+
+# District headquarters used for multi-station fetching: name -> (latitude, longitude)
+STATIONS = {
+    "thiruvananthapuram": (8.5241, 76.9366),
+    "kollam": (8.8932, 76.6141),
+    "pathanamthitta": (9.2648, 76.7870),
+    "alappuzha": (9.4981, 76.3388),
+    "kottayam": (9.5916, 76.5222),
+    "idukki": (9.8497, 76.9720),
+    "ernakulam": (LATITUDE, LONGITUDE),
+    "thrissur": (10.5276, 76.2144),
+    "palakkad": (10.7867, 76.6548),
+    "malappuram": (11.0510, 76.0711),
+    "kozhikode": (11.2588, 75.7804),
+    "wayanad": (11.6085, 76.0830),
+    "kannur": (11.8745, 75.3704),
+    "kasaragod": (12.4996, 74.9869),
+}
+
+# Make sure all required weather variables are listed here
+# The order of variables in hourly or daily is important to assign them correctly below
+DAILY_VARIABLES = ["weather_code", "temperature_2m_mean", "daylight_duration", "sunshine_duration", "precipitation_sum",
+                   "wind_speed_10m_max", "temperature_2m_min", "cloud_cover_mean", "dew_point_2m_mean",
+                   "apparent_temperature_mean", "apparent_temperature_max", "apparent_temperature_min",
+                   "temperature_2m_max", "wind_gusts_10m_max", "dew_point_2m_max", "dew_point_2m_min",
+                   "cloud_cover_max", "cloud_cover_min", "relative_humidity_2m_mean", "relative_humidity_2m_max",
+                   "relative_humidity_2m_min", "pressure_msl_mean", "pressure_msl_max", "pressure_msl_min", "wind_speed_10m_mean",
+                   "wind_gusts_10m_min", "wind_speed_10m_min", "wind_gusts_10m_mean", "surface_pressure_min",
+                   "surface_pressure_max", "surface_pressure_mean"]
+
+
+def make_client(pool_size=10):
     # Setup the Open-Meteo API client with cache and retry on error
     cache_session = requests_cache.CachedSession('.cache', expire_after = -1)
+    # Count API requests and cache hits (see metrics.py)
+    cache_session.hooks["response"].append(record_response)
     retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-    openmeteo = openmeteo_requests.Client(session = retry_session)
 
-    # Make sure all required weather variables are listed here
-    # The order of variables in hourly or daily is important to assign them correctly below
-    url = "https://archive-api.open-meteo.com/v1/archive"
+    # Size the connection pool for concurrent requests, keeping the retry policy
+    for prefix in ("http://", "https://"):
+        max_retries = retry_session.get_adapter(prefix).max_retries
+        retry_session.mount(prefix, HTTPAdapter(max_retries = max_retries,
+                                                pool_connections = pool_size, pool_maxsize = pool_size))
+    return openmeteo_requests.Client(session = retry_session)
+
+
+def response_to_dataframe(response):
+    # Process daily data. The order of variables needs to be the same as requested.
+    daily = response.Daily()
+
+    daily_data = {"date": pd.date_range(
+	    start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
+	    end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
+	    freq = pd.Timedelta(seconds = daily.Interval()),
+	    inclusive = "left"
+    )}
+    for i, name in enumerate(DAILY_VARIABLES):
+        daily_data[name] = daily.Variables(i).ValuesAsNumpy()
+
+    return pd.DataFrame(data = daily_data)
+
+
+def drop_trailing_missing(dataframe):
+    # The archive lags a few days behind today and returns those days with every variable
+    # missing; keep them out of the store so the watermark stays at the last real observation
+    observed = dataframe[DAILY_VARIABLES].notna().any(axis = 1).to_numpy().nonzero()[0]
+    return dataframe.iloc[:observed[-1] + 1] if len(observed) else dataframe.iloc[:0]
+
+
+@instrumented("fetch")
+def fetch_weather_data(incremental=False, url=ARCHIVE_URL, table=HISTORY_TABLE, end_date=None, client=None):
+
+    openmeteo = client or make_client()
+    end_date = pd.Timestamp(end_date or date.today()).date()
+
+    start_date = pd.Timestamp(HISTORY_START).date()
+    # Watermark of the stored history, read from the newest year partition only
+    last_date = latest_date(table) if incremental else None
+    if last_date is not None:
+        # Only fetch the missing window after the stored watermark
+        start_date = last_date.date() + timedelta(days = 1)
+        if start_date > end_date:
+            print(f"✅ Weather data already up to date ({last_date.date()})")
+            return pd.DataFrame(columns = ["date"] + DAILY_VARIABLES)
+
     params = {
-	    "latitude": 9.9399,
-	    "longitude": 76.2602,
-	    "start_date": "1940-12-31",
-	    "end_date": "2025-04-11",
-	    "daily": ["weather_code", "temperature_2m_mean", "daylight_duration", "sunshine_duration", "precipitation_sum",
-                "wind_speed_10m_max", "temperature_2m_min", "cloud_cover_mean", "dew_point_2m_mean", 
-                "apparent_temperature_mean", "apparent_temperature_max", "apparent_temperature_min", 
-                "temperature_2m_max", "wind_gusts_10m_max", "dew_point_2m_max", "dew_point_2m_min",
-                "cloud_cover_max", "cloud_cover_min", "relative_humidity_2m_mean", "relative_humidity_2m_max",
-                "relative_humidity_2m_min", "pressure_msl_mean", "pressure_msl_max", "pressure_msl_min", "wind_speed_10m_mean", 
-                "wind_gusts_10m_min", "wind_speed_10m_min", "wind_gusts_10m_mean", "surface_pressure_min", 
-                "surface_pressure_max", "surface_pressure_mean"]
+	    "latitude": LATITUDE,
+	    "longitude": LONGITUDE,
+	    "start_date": start_date.isoformat(),
+	    "end_date": end_date.isoformat(),
+	    "daily": DAILY_VARIABLES
     }
     responses = openmeteo.weather_api(url, params=params)
 
@@ -37,83 +116,82 @@ def fetch_weather_data():
     print(f"Timezone {response.Timezone()}{response.TimezoneAbbreviation()}")
     print(f"Timezone difference to GMT+0 {response.UtcOffsetSeconds()} s")
 
-    # Process daily data. The order of variables needs to be the same as requested.
-    daily = response.Daily()
-    daily_weather_code = daily.Variables(0).ValuesAsNumpy()
-    daily_temperature_2m_mean = daily.Variables(1).ValuesAsNumpy()
-    daily_daylight_duration = daily.Variables(2).ValuesAsNumpy()
-    daily_sunshine_duration = daily.Variables(3).ValuesAsNumpy()
-    daily_precipitation_sum = daily.Variables(4).ValuesAsNumpy()
-    daily_wind_speed_10m_max = daily.Variables(5).ValuesAsNumpy()
-    daily_temperature_2m_min = daily.Variables(6).ValuesAsNumpy()
-    daily_cloud_cover_mean = daily.Variables(7).ValuesAsNumpy()
-    daily_dew_point_2m_mean = daily.Variables(8).ValuesAsNumpy()
-    daily_apparent_temperature_mean = daily.Variables(9).ValuesAsNumpy()
-    daily_apparent_temperature_max = daily.Variables(10).ValuesAsNumpy()
-    daily_apparent_temperature_min = daily.Variables(11).ValuesAsNumpy()
-    daily_temperature_2m_max = daily.Variables(12).ValuesAsNumpy()
-    daily_wind_gusts_10m_max = daily.Variables(13).ValuesAsNumpy()
-    daily_dew_point_2m_max = daily.Variables(14).ValuesAsNumpy()
-    daily_dew_point_2m_min = daily.Variables(15).ValuesAsNumpy()
-    daily_cloud_cover_max = daily.Variables(16).ValuesAsNumpy()
-    daily_cloud_cover_min = daily.Variables(17).ValuesAsNumpy()
-    daily_relative_humidity_2m_mean = daily.Variables(18).ValuesAsNumpy()
-    daily_relative_humidity_2m_max = daily.Variables(19).ValuesAsNumpy()
-    daily_relative_humidity_2m_min = daily.Variables(20).ValuesAsNumpy()
-    daily_pressure_msl_mean = daily.Variables(21).ValuesAsNumpy()
-    daily_pressure_msl_max = daily.Variables(22).ValuesAsNumpy()
-    daily_pressure_msl_min = daily.Variables(23).ValuesAsNumpy()
-    daily_wind_speed_10m_mean = daily.Variables(24).ValuesAsNumpy()
-    daily_wind_gusts_10m_min = daily.Variables(25).ValuesAsNumpy()
-    daily_wind_speed_10m_min = daily.Variables(26).ValuesAsNumpy()
-    daily_wind_gusts_10m_mean = daily.Variables(27).ValuesAsNumpy()
-    daily_surface_pressure_min = daily.Variables(28).ValuesAsNumpy()
-    daily_surface_pressure_max = daily.Variables(29).ValuesAsNumpy()
-    daily_surface_pressure_mean = daily.Variables(30).ValuesAsNumpy()
+    daily_dataframe = drop_trailing_missing(response_to_dataframe(response))
 
-    daily_data = {"date": pd.date_range(
-	    start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-	    end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-	    freq = pd.Timedelta(seconds = daily.Interval()),
-	    inclusive = "left"
-    )}
+    if last_date is None:
+        write_table(daily_dataframe, table)
+        print(f"✅ Weather data fetched and saved to table '{table}'")
+        return daily_dataframe
+
+    # Idempotent append: drop duplicate dates and anything already stored
+    if last_date.tzinfo is None:
+        last_date = last_date.tz_localize("UTC")
+    new_rows = daily_dataframe.drop_duplicates("date", keep = "last")
+    new_rows = new_rows[new_rows["date"] > last_date].sort_values("date")
+    if new_rows.empty:
+        print(f"✅ No new weather data after {last_date.date()}")
+        return new_rows
+    append_table(new_rows, table)
+    print(f"✅ Appended {len(new_rows)} new day(s) to table '{table}'")
+    return new_rows
+
+def fetch_station(openmeteo, station, latitude, longitude, start_date, end_date, url=ARCHIVE_URL):
+    params = {
+	    "latitude": latitude,
+	    "longitude": longitude,
+	    "start_date": start_date,
+	    "end_date": end_date,
+	    "daily": DAILY_VARIABLES
+    }
+    response = openmeteo.weather_api(url, params=params)[0]
+    station_dataframe = response_to_dataframe(response)
+    station_dataframe.insert(0, "station", station)
+    return station_dataframe
+
+
+@instrumented("fetch_stations")
+def fetch_stations(stations=STATIONS, start_date=HISTORY_START, end_date=None, max_workers=8,
+                   url=ARCHIVE_URL, table=STATIONS_TABLE, client=None, incremental=False):
+    # One pooled, cached session is shared by all worker threads
+    openmeteo = client or make_client(pool_size = max_workers)
+    end_date = pd.Timestamp(end_date or date.today()).date().isoformat()
+    start_date = pd.Timestamp(start_date).date().isoformat()
+
+    # Per-station watermarks: each station only fetches the days after its latest stored date
+    last_dates = latest_dates(table) if incremental and table is not None else {}
+    starts = {station: start_date for station in stations}
+    for station, last_date in last_dates.items():
+        if station in starts:
+            starts[station] = max(start_date, (last_date.date() + timedelta(days = 1)).isoformat())
+    pending = {station: coordinates for station, coordinates in stations.items() if starts[station] <= end_date}
+    if len(pending) == 0:
+        print(f"✅ Weather data for {len(stations)} stations already up to date")
+        return pd.DataFrame(columns = ["station", "date"] + DAILY_VARIABLES)
+
+    with ThreadPoolExecutor(max_workers = max_workers) as pool:
+        futures = [pool.submit(fetch_station, openmeteo, station, latitude, longitude, starts[station], end_date, url)
+                   for station, (latitude, longitude) in pending.items()]
+        frames = [drop_trailing_missing(future.result()) for future in futures]
+
+    # Long format keyed by (station, date)
+    stations_dataframe = pd.concat(frames, ignore_index = True)
+    stations_dataframe = stations_dataframe.drop_duplicates(["station", "date"], keep = "last")
+    stations_dataframe = stations_dataframe.sort_values(["station", "date"], ignore_index = True)
 
-    daily_data["weather_code"] = daily_weather_code
-    daily_data["temperature_2m_mean"] = daily_temperature_2m_mean
-    daily_data["daylight_duration"] = daily_daylight_duration
-    daily_data["sunshine_duration"] = daily_sunshine_duration
-    daily_data["precipitation_sum"] = daily_precipitation_sum
-    daily_data["wind_speed_10m_max"] = daily_wind_speed_10m_max
-    daily_data["temperature_2m_min"] = daily_temperature_2m_min
-    daily_data["cloud_cover_mean"] = daily_cloud_cover_mean
-    daily_data["dew_point_2m_mean"] = daily_dew_point_2m_mean
-    daily_data["apparent_temperature_mean"] = daily_apparent_temperature_mean
-    daily_data["apparent_temperature_max"] = daily_apparent_temperature_max
-    daily_data["apparent_temperature_min"] = daily_apparent_temperature_min
-    daily_data["temperature_2m_max"] = daily_temperature_2m_max
-    daily_data["wind_gusts_10m_max"] = daily_wind_gusts_10m_max
-    daily_data["dew_point_2m_max"] = daily_dew_point_2m_max
-    daily_data["dew_point_2m_min"] = daily_dew_point_2m_min
-    daily_data["cloud_cover_max"] = daily_cloud_cover_max
-    daily_data["cloud_cover_min"] = daily_cloud_cover_min
-    daily_data["relative_humidity_2m_mean"] = daily_relative_humidity_2m_mean
-    daily_data["relative_humidity_2m_max"] = daily_relative_humidity_2m_max
-    daily_data["relative_humidity_2m_min"] = daily_relative_humidity_2m_min
-    daily_data["pressure_msl_mean"] = daily_pressure_msl_mean
-    daily_data["pressure_msl_max"] = daily_pressure_msl_max
-    daily_data["pressure_msl_min"] = daily_pressure_msl_min
-    daily_data["wind_speed_10m_mean"] = daily_wind_speed_10m_mean
-    daily_data["wind_gusts_10m_min"] = daily_wind_gusts_10m_min
-    daily_data["wind_speed_10m_min"] = daily_wind_speed_10m_min
-    daily_data["wind_gusts_10m_mean"] = daily_wind_gusts_10m_mean
-    daily_data["surface_pressure_min"] = daily_surface_pressure_min
-    daily_data["surface_pressure_max"] = daily_surface_pressure_max
-    daily_data["surface_pressure_mean"] = daily_surface_pressure_mean
-
-    daily_dataframe = pd.DataFrame(data = daily_data)
-
-    daily_dataframe.to_csv("historical_weather_daily.csv", index = False)
-    print("✅ Weather data fetched and saved to 'historical_weather_daily.csv'")
+    if table is None:
+        return stations_dataframe
+    if len(last_dates) > 0:
+        if not stations_dataframe.empty:
+            append_table(stations_dataframe, table)
+        print(f"✅ Appended {len(stations_dataframe)} new row(s) for {len(frames)} stations to table '{table}'")
+    else:
+        write_table(stations_dataframe, table)
+        print(f"✅ Weather data for {len(frames)} stations saved to table '{table}'")
+    return stations_dataframe
 
 if __name__ == "__main__":
-    fetch_weather_data()
\ No newline at end of file
+    import sys
+    if "--stations" in sys.argv:
+        fetch_stations(incremental = "--full" not in sys.argv)
+    else:
+        fetch_weather_data(incremental = "--full" not in sys.argv)
@@ -0,0 +1,182 @@
+# forecast.py
+
+import joblib
+import numpy as np
+import pandas as pd
+from artifacts import CompactForest, compact_exists, flatten_forest, is_forest, load_compact
+from features import LAG_FEATURES, feature_names, history_days, window_features
+from metrics import timer
+from preprocess import WEATHER_CODE_MAP
+from train_model import FEATURES_PATH, MODELS
+
+# Model name -> the raw column it forecasts; every other raw column keeps its
+# last observed value over the horizon (persistence)
+TARGET_COLUMNS = {name: target for name, (target, _) in MODELS.items()}
+
+# Targets that cannot go below zero; linear and boosted backends can predict
+# negative rainfall, which would also be fed back into the next step's window
+NON_NEGATIVE = {"precipitation"}
+
+# Probabilistic forecasts: quantiles of the forecast distribution and the
+# probability of more rain than each threshold (mm)
+QUANTILES = (0.1, 0.5, 0.9)
+RAIN_THRESHOLDS = (1.0, 10.0)
+
+
+def load_models():
+    # Prefer the memory-mapped compact export (see artifacts.py) over the joblib pickles
+    models = {name: load_compact(name) if compact_exists(name) else joblib.load(path)
+              for name, (_, path) in MODELS.items()}
+    return models, joblib.load(FEATURES_PATH)
+
+
+def _naive_dates(values, tz):
+    # Base dates in the data's wall-clock time, whether given naive or aware
+    values = pd.DatetimeIndex(pd.to_datetime(pd.Series(values)))
+    if values.tz is not None:
+        values = values.tz_convert(tz or "UTC").tz_localize(None)
+    return values
+
+
+def initial_windows(df, base_dates=None):
+    # Past `history_days()` days of raw values up to and including each base date,
+    # as a (bases, columns, days) float32 array, oldest day first.
+    # `df` is sorted by date (and by station first if it has a station column).
+    # base_dates defaults to the latest date of each station; with a station column
+    # it is a frame of (station, date) pairs.
+    history = history_days()
+    dates = pd.DatetimeIndex(df["date"])
+    tz = dates.tz
+    dates = dates.tz_localize(None).to_numpy()
+    stations = df["station"].to_numpy() if "station" in df.columns else np.zeros(len(df))
+
+    if base_dates is None:
+        last = np.r_[stations[1:] != stations[:-1], True]
+        positions = np.flatnonzero(last)
+    else:
+        if "station" in df.columns:
+            base_dates = pd.DataFrame(base_dates)
+            keys = pd.MultiIndex.from_arrays([base_dates["station"], _naive_dates(base_dates["date"], tz)])
+            index = pd.MultiIndex.from_arrays([stations, dates])
+        else:
+            keys = _naive_dates(base_dates, tz)
+            index = pd.DatetimeIndex(dates)
+        positions = index.get_indexer(keys)
+        if (positions < 0).any():
+            raise ValueError("Base dates must be present in the data")
+
+    first = positions - (history - 1)
+    if (first < 0).any():
+        raise ValueError(f"Forecasting needs {history} days of history before each base date")
+    # The window must be `history` consecutive days of the same station
+    span = (dates[positions] - dates[first]) / np.timedelta64(1, "D")
+    if (span != history - 1).any() or (stations[positions] != stations[first]).any():
+        raise ValueError(f"Forecasting needs {history} consecutive days before each base date")
+
+    gather = first[:, None] + np.arange(history)
+    values = df[LAG_FEATURES].to_numpy(dtype=np.float32)
+    windows = np.ascontiguousarray(values[gather].transpose(0, 2, 1))
+    return windows, df.iloc[positions][[c for c in ("station", "date") if c in df.columns]].reset_index(drop=True)
+
+
+def forecast(models, feature_cols, windows, horizon, predict=None):
+    # Recursive multi-day forecast for every base at once: one predict call per model per step.
+    # windows: (bases, columns, days) from initial_windows(); it is used as a ring buffer and
+    # updated in place. predict(name, model, X) replaces model.predict(X).
+    # Returns name -> (bases, horizon) array of predictions.
+    n_bases, _, history = windows.shape
+    feature_index = pd.Index(feature_names()).get_indexer(feature_cols)
+    if (feature_index < 0).any():
+        raise ValueError("Models were trained on features that features.py does not define")
+    target_index = {name: LAG_FEATURES.index(col) for name, col in TARGET_COLUMNS.items()}
+
+    preds = {name: np.empty((n_bases, horizon)) for name in models}
+    head = 0  # slot holding the oldest day
+    for step in range(horizon):
+        ordered = windows[:, :, (head + np.arange(history)) % history]
+        X = window_features(ordered).reshape(n_bases, -1)[:, feature_index]
+
+        # The next day: predicted targets, persistence for everything else
+        next_day = ordered[:, :, -1].copy()
+        for name, model in models.items():
+            with timer("weather_model_predict_seconds", model=name):
+                preds[name][:, step] = model.predict(X) if predict is None else predict(name, model, X)
+            if name in NON_NEGATIVE:
+                np.maximum(preds[name][:, step], 0, out=preds[name][:, step])
+            next_day[:, target_index[name]] = preds[name][:, step]
+
+        windows[:, :, head] = next_day
+        head = (head + 1) % history
+    return preds
+
+
+def _member_predictor(model):
+    # Forests predict per tree in their compact form; other models have no members
+    if isinstance(model, CompactForest):
+        return model
+    if is_forest(model):
+        return CompactForest(*flatten_forest(model))
+    return None
+
+
+def forecast_members(models, feature_cols, windows, horizon):
+    # Trajectory ensemble: member m follows tree m (mod the forest size) of every forest
+    # through the horizon, feeding its own predictions back, so the spread at each step
+    # is the per-tree spread carried through the recursion. Models that are not forests
+    # give every member the same prediction (a degenerate distribution).
+    # Returns name -> (bases, members, horizon) array of predictions.
+    predictors = {name: _member_predictor(model) for name, model in models.items()}
+    n_members = max((p.n_estimators for p in predictors.values() if p is not None), default=1)
+    n_bases = len(windows)
+    member_windows = np.repeat(windows, n_members, axis=0)
+    members = np.tile(np.arange(n_members), n_bases)
+
+    def predict(name, model, X):
+        predictor = predictors[name]
+        if predictor is None:
+            return model.predict(X)
+        return predictor.predict_members(X, members % predictor.n_estimators)
+
+    preds = forecast(models, feature_cols, member_windows, horizon, predict=predict)
+    return {name: values.reshape(n_bases, n_members, horizon) for name, values in preds.items()}
+
+
+def distribution_columns(members, quantiles=QUANTILES, thresholds=RAIN_THRESHOLDS):
+    # Quantile and rain-probability columns, flattened to the (base, horizon) row order
+    columns = {}
+    for name, col in TARGET_COLUMNS.items():
+        if name == "weather_code":
+            continue
+        for q, values in zip(quantiles, np.quantile(members[name], quantiles, axis=1)):
+            columns[f"{col}_q{round(q * 100)}"] = values.ravel()
+    for threshold in thresholds:
+        exceeds = members["precipitation"] > threshold
+        columns[f"precipitation_prob_{threshold:g}mm"] = exceeds.mean(axis=1).ravel()
+    return columns
+
+
+def next_day_features(feature_cols, windows):
+    # Model inputs of the first forecast step, for display
+    X = window_features(windows).reshape(len(windows), -1)
+    return pd.DataFrame(X, columns=feature_names())[feature_cols]
+
+
+def forecast_frame(models, feature_cols, df, horizon=7, base_dates=None, probabilistic=False):
+    # Long-format forecast: one row per (station, base date, horizon day). With
+    # `probabilistic`, quantile and rain-probability columns from forecast_members() are added.
+    with timer("weather_forecast_seconds"):
+        windows, bases = initial_windows(df, base_dates)
+        members = forecast_members(models, feature_cols, windows.copy(), horizon) if probabilistic else None
+        preds = forecast(models, feature_cols, windows, horizon)
+
+    out = bases.rename(columns={"date": "base_date"}).loc[np.repeat(np.arange(len(bases)), horizon)]
+    out = out.reset_index(drop=True)
+    out["horizon"] = np.tile(np.arange(1, horizon + 1), len(bases))
+    out["date"] = out["base_date"] + pd.to_timedelta(out["horizon"], unit="D")
+    for name, col in TARGET_COLUMNS.items():
+        out[col] = preds[name].ravel()
+    out["weather_description"] = out["weather_code"].astype(int).map(WEATHER_CODE_MAP).fillna("Unknown")
+    if members is not None:
+        for col, values in distribution_columns(members).items():
+            out[col] = values
+    return out
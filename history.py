@@ -0,0 +1,152 @@
+# history.py
+
+import glob
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from manifest import version
+from store import FEATURES_TABLE, read_table
+
+# Query layer over the daily history for the dashboard: O(1) lookup of a date,
+# binary-search date ranges, and climatology/trend aggregates that are computed once
+# per data version and persisted in AGGREGATES_DIR.
+AGGREGATES_DIR = "aggregates"
+TREND_COLUMNS = ["temperature_2m_mean", "precipitation_sum"]
+
+# Rolling trend: mean over this many months of monthly means
+TREND_MONTHS = 12
+
+
+class History:
+
+    def __init__(self, df):
+        # Positions and spans need rows sorted by date (by station first if there is a
+        # station column), as the store returns them; other input is sorted here
+        keys = ["station", "date"] if "station" in df.columns else ["date"]
+        if not pd.MultiIndex.from_frame(df[keys]).is_monotonic_increasing:
+            df = df.sort_values(keys, kind="stable", ignore_index=True)
+        self.df = df
+        dates = pd.DatetimeIndex(df["date"]).tz_localize(None).to_numpy()
+        self.dates = dates
+        # station -> (first row, end row); one unnamed station without a station column
+        if "station" in df.columns:
+            stations = df["station"].to_numpy()
+            starts = np.flatnonzero(np.r_[True, stations[1:] != stations[:-1]])
+            ends = np.r_[starts[1:], len(df)]
+            self.spans = {stations[s]: (s, e) for s, e in zip(starts, ends)}
+        else:
+            self.spans = {None: (0, len(df))}
+        self.min_date = pd.Timestamp(dates.min()) if len(df) else None
+        self.max_date = pd.Timestamp(dates.max()) if len(df) else None
+
+    def _span(self, station):
+        if station is None and None not in self.spans:
+            raise ValueError("Pass a station: the history has several")
+        if station not in self.spans:
+            raise KeyError(f"Unknown station {station!r}")
+        return self.spans[station]
+
+    def position(self, date, station=None):
+        # Row of `date`, or None. Daily rows are consecutive, so the offset from the
+        # first day is the row; gaps fall back to a binary search.
+        start, end = self._span(station)
+        if start == end:
+            return None
+        date = np.datetime64(pd.Timestamp(date).tz_localize(None).normalize(), "ns")
+        guess = start + int((date - self.dates[start]) // np.timedelta64(1, "D"))
+        if start <= guess < end and self.dates[guess] == date:
+            return guess
+        position = start + int(np.searchsorted(self.dates[start:end], date))
+        return position if position < end and self.dates[position] == date else None
+
+    def row(self, date, station=None):
+        # The day's row as a one-row frame (empty when the date is missing)
+        position = self.position(date, station)
+        if position is None:
+            return self.df.iloc[:0]
+        return self.df.iloc[position:position + 1]
+
+    def range(self, start_date=None, end_date=None, station=None):
+        # Rows with start_date <= date <= end_date, as a slice (no scan)
+        start, end = self._span(station)
+        dates = self.dates[start:end]
+        lo = 0 if start_date is None else np.searchsorted(
+            dates, np.datetime64(pd.Timestamp(start_date).tz_localize(None), "ns"), side="left")
+        hi = len(dates) if end_date is None else np.searchsorted(
+            dates, np.datetime64(pd.Timestamp(end_date).tz_localize(None), "ns"), side="right")
+        return self.df.iloc[start + lo:start + hi]
+
+
+def _group_keys(df):
+    return ["station"] if "station" in df.columns else []
+
+
+def build_aggregates(df, columns=TREND_COLUMNS):
+    # Day-of-year climatology, monthly and yearly means, and a rolling trend of the
+    # monthly means, per station when there is a station column
+    keys = _group_keys(df)
+    dates = pd.DatetimeIndex(df["date"]).tz_localize(None)
+    values = df[keys + columns].assign(
+        day_of_year=dates.dayofyear, month=dates.to_period("M").to_timestamp(), year=dates.year)
+
+    climatology = values.groupby(keys + ["day_of_year"], observed=True)[columns].agg(["mean", "std"])
+    climatology.columns = [f"{col}_{stat}" for col, stat in climatology.columns]
+    monthly = values.groupby(keys + ["month"], observed=True)[columns].mean().reset_index()
+    yearly = values.groupby(keys + ["year"], observed=True)[columns].mean().reset_index()
+
+    trend = monthly.copy()
+    rolling = (monthly.groupby(keys, observed=True)[columns] if keys else monthly[columns]) \
+        .rolling(TREND_MONTHS, min_periods=TREND_MONTHS).mean()
+    trend[columns] = rolling.reset_index(drop=True) if keys else rolling
+    return {
+        "climatology": climatology.reset_index(),
+        "monthly": monthly,
+        "yearly": yearly,
+        "trend": trend.dropna(subset=columns).reset_index(drop=True),
+    }
+
+
+def aggregates_path(data_version, root=AGGREGATES_DIR):
+    return os.path.join(root, f"{data_version}.pkl")
+
+
+def load_aggregates(df=None, data_version=None, root=AGGREGATES_DIR):
+    # Aggregates of the current data version: read from disk, or built and saved
+    # (replacing those of older versions)
+    data_version = data_version or version([FEATURES_TABLE])
+    path = aggregates_path(data_version, root)
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    if df is None:
+        df = read_table(FEATURES_TABLE, columns=["date"] + TREND_COLUMNS)
+    aggregates = build_aggregates(df)
+    os.makedirs(root, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(aggregates, tmp_path)
+    os.replace(tmp_path, path)
+    for old in glob.glob(os.path.join(root, "*.pkl")):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                # Another process (dashboard or pipeline) cleaned it up first
+                pass
+    return aggregates
+
+
+def anomalies(rows, climatology, columns=TREND_COLUMNS):
+    # Departure of each row from the day-of-year climatology
+    keys = _group_keys(rows)
+    out = rows[keys + ["date"] + columns].copy()
+    out["day_of_year"] = pd.DatetimeIndex(out["date"]).dayofyear
+    out = out.merge(climatology[keys + ["day_of_year"] + [f"{c}_mean" for c in columns]],
+                    on=keys + ["day_of_year"], how="left")
+    for col in columns:
+        out[f"{col}_anomaly"] = out[col] - out[f"{col}_mean"]
+    return out.drop(columns=["day_of_year"])
+
+if __name__ == "__main__":
+    aggregates = load_aggregates()
+    print(f"✅ Aggregates built: {', '.join(f'{k} ({len(v)} rows)' for k, v in aggregates.items())}")
@@ -0,0 +1,85 @@
+# loadgen.py
+
+import argparse
+import json
+import threading
+import time
+import numpy as np
+import requests
+from serve import HOST, LOG_PATH, PORT
+
+# Replays the request log written by serve.py against a running server and
+# reports latency percentiles and throughput.
+
+
+def read_logged_requests(path=LOG_PATH):
+    logged = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # Replay requests that succeeded; other lines (or other files' formats) are skipped
+            if isinstance(entry, dict) and isinstance(entry.get("request"), dict) and entry.get("status") == 200:
+                logged.append(entry["request"])
+    return logged
+
+
+def replay(logged, url, total, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        session = requests.Session()
+        own = []
+        failed = 0
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=logged[i % len(logged)], timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            own.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "concurrency": concurrency,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "requests_per_second": len(latencies) / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay serve.py's request log and measure latency.")
+    parser.add_argument("--log", default=LOG_PATH)
+    parser.add_argument("--url", default=f"http://{HOST}:{PORT}/forecast")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    logged = read_logged_requests(args.log)
+    if len(logged) == 0:
+        # Nothing logged yet: replay the default next-day forecast
+        logged = [{"horizon": 1}]
+    result = replay(logged, args.url, args.requests, args.concurrency)
+    print(f"📈 {result['requests']} requests ({result['errors']} errors), concurrency {result['concurrency']}: "
+          f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+          f"{result['requests_per_second']:.0f} req/s")
@@ -0,0 +1,79 @@
+# manifest.py
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+# Version manifest: artifact name -> content hash of its latest write. Writers
+# (store tables, trained models) record a new hash; readers such as the dashboard
+# compare versions instead of re-reading or re-hashing the artifacts themselves.
+MANIFEST_PATH = "manifest.json"
+
+_lock = threading.Lock()
+
+
+def _reset_lock():
+    # A forked worker must not inherit the lock held by another thread of its parent
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock)
+
+
+def file_digest(paths, previous=""):
+    # sha256 over the contents of `paths`, chained onto a previous digest
+    digest = hashlib.sha256(previous.encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextmanager
+def _locked(path):
+    # Pipeline stages run in parallel threads, and other scripts may write at the same
+    # time: serialise every read-modify-write so no update is lost. lockf locks belong to
+    # the process, so forked workers never inherit one held by the parent.
+    with _lock, open(f"{path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def record(name, digest, path=MANIFEST_PATH):
+    with _locked(path):
+        manifest = read_manifest(path)
+        manifest[name] = {"hash": digest, "updated": datetime.now(timezone.utc).isoformat()}
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def artifact_hash(name, path=MANIFEST_PATH):
+    return read_manifest(path).get(name, {}).get("hash", "")
+
+
+def version(names, path=MANIFEST_PATH):
+    # Short combined version of several artifacts, e.g. for cache keys
+    manifest = read_manifest(path)
+    combined = "|".join(manifest.get(name, {}).get("hash", "") for name in names)
+    return hashlib.sha256(combined.encode()).hexdigest()[:16]
@@ -0,0 +1,332 @@
+# metrics.py
+
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+
+# One instrumentation layer for the whole pipeline:
+#   stage("preprocess")         wall time, CPU time, peak RSS and rows/sec of a stage
+#   count(...) / observe(...)   counters and latency histograms on hot paths
+# Every finished stage is appended to EVENTS_PATH (JSON lines) and a Prometheus
+# text-format snapshot of all metrics is written to metrics/<job>.prom, which
+# node_exporter's textfile collector can pick up.
+METRICS_DIR = "metrics"
+EVENTS_PATH = os.path.join(METRICS_DIR, "events.jsonl")
+
+# Opt-in sampling profiler: WEATHER_PROFILE=profile.folded python train_model.py
+# writes collapsed stacks of the run (flamegraph.pl, speedscope) to that file
+PROFILE_ENV = "WEATHER_PROFILE"
+PROFILE_INTERVAL = 0.005
+
+# Histogram buckets for prediction latencies, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_lock = threading.RLock()
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+_active = []       # open stages of every thread, for peak RSS
+_local = threading.local()
+_job = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+if not _job or _job.startswith("-"):
+    _job = "python"
+_profiler = None
+
+
+def set_job(name):
+    # Name of the .prom file this process writes (defaults to the script name)
+    global _job
+    _job = name
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        values = _histograms.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 2))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+                break
+        values[-2] += seconds
+        values[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    # Observe the duration of the block in histogram `name`
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+# ---------- requests_cache session ----------
+def record_response(response, *args, **kwargs):
+    # Response hook for the cached API session. requests_cache also runs hooks for
+    # cached responses; the inner call for a miss gets a plain Response without
+    # `from_cache`, so each request is counted once.
+    if not hasattr(response, "from_cache"):
+        return
+    count("weather_api_requests_total")
+    if response.from_cache:
+        count("weather_api_cache_hits_total")
+
+
+def cache_hit_ratio():
+    with _lock:
+        requests = _counters.get(_key("weather_api_requests_total", {}), 0)
+        hits = _counters.get(_key("weather_api_cache_hits_total", {}), 0)
+    return hits / requests if requests else None
+
+
+# ---------- Stages ----------
+def _peak_rss_mb():
+    # High-water mark of resident memory since the last reset (Linux), else since start
+    try:
+        with open("/proc/self/status") as f:
+            return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1)) / 1024
+    except (OSError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _children_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+@contextmanager
+def stage(name, rows=None):
+    # Times a pipeline stage. Stages may nest and run in parallel threads; CPU time is
+    # process-wide (plus finished worker processes) and peak RSS is the process peak
+    # while the stage was open. Set record["rows"] (or call set_rows) for rows/sec.
+    global _profiler
+    record = {"stage": name, "rows": rows, "peak_rss_mb": 0.0}
+    with _lock:
+        # Fold the current peak into open stages before resetting it for this one
+        peak = _peak_rss_mb()
+        for other in _active:
+            other["peak_rss_mb"] = max(other["peak_rss_mb"], peak)
+        _reset_peak_rss()
+        _active.append(record)
+        # The outermost open stage samples the profiler (when enabled); samples of
+        # every stage in the process accumulate in the same file
+        if os.environ.get(PROFILE_ENV) and len(_active) == 1:
+            if _profiler is None:
+                _profiler = SamplingProfiler(os.environ[PROFILE_ENV])
+            _profiler.start()
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(record)
+
+    status = "success"
+    start, cpu_start, children_start = time.perf_counter(), time.process_time(), _children_cpu()
+    try:
+        yield record
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start + _children_cpu() - children_start
+        stack.pop()
+        with _lock:
+            _active.remove(record)
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], _peak_rss_mb())
+            for other in _active:
+                other["peak_rss_mb"] = max(other["peak_rss_mb"], record["peak_rss_mb"])
+            if _profiler is not None and _profiler.active.is_set() and len(_active) == 0:
+                _profiler.stop()
+                print(f"🔥 Profile written to '{_profiler.path}'")
+        _finish_stage(record, status, wall, cpu)
+
+
+def set_rows(rows):
+    # Rows processed by the innermost open stage of this thread
+    stack = getattr(_local, "stack", [])
+    if stack:
+        stack[-1]["rows"] = rows
+
+
+def instrumented(name):
+    # Decorator form of stage(); a returned DataFrame's length counts as rows processed
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                result = func(*args, **kwargs)
+                if record["rows"] is None and isinstance(result, pd.DataFrame):
+                    record["rows"] = len(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def _finish_stage(record, status, wall, cpu):
+    name, rows = record["stage"], record["rows"]
+    event = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "job": _job,
+        "stage": name,
+        "status": status,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "peak_rss_mb": round(record["peak_rss_mb"], 1),
+        "rows": rows,
+        "rows_per_second": round(rows / wall, 1) if rows is not None and wall > 0 else None,
+    }
+    count("weather_stage_runs_total", stage=name, status=status)
+    gauge("weather_stage_wall_seconds", wall, stage=name)
+    gauge("weather_stage_cpu_seconds", cpu, stage=name)
+    gauge("weather_stage_peak_rss_bytes", record["peak_rss_mb"] * 2**20, stage=name)
+    if rows is not None:
+        gauge("weather_stage_rows", rows, stage=name)
+        if wall > 0:
+            gauge("weather_stage_rows_per_second", rows / wall, stage=name)
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with _lock, open(EVENTS_PATH, "a") as f:
+            f.write(json.dumps(event) + "\n")
+        export()
+    except OSError as e:
+        # Metrics must never fail the stage they describe
+        print(f"⚠️ Could not write metrics: {e}")
+
+
+# ---------- Export ----------
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def prometheus_text():
+    lines = []
+    with _lock:
+        ratio = cache_hit_ratio()
+        gauges = dict(_gauges)
+        if ratio is not None:
+            gauges[_key("weather_api_cache_hit_ratio", {})] = ratio
+        for kind, values in (("counter", _counters), ("gauge", gauges)):
+            seen = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} {kind}")
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        seen = set()
+        for (name, labels), values in sorted(_histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, values):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {values[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    # Atomically rewrite this process's Prometheus snapshot
+    path = path or os.path.join(METRICS_DIR, f"{_job}.prom")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+    return path
+
+
+# ---------- Sampling profiler ----------
+class SamplingProfiler:
+    # Samples the stacks of all threads every `interval` seconds from a background
+    # thread while started, and writes the samples so far on every stop in collapsed
+    # ("folded") format: one line per distinct stack, "thread;outer;...;inner count".
+
+    def __init__(self, path, interval=PROFILE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.samples = Counter()
+        self.active = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.active.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            if not self.active.is_set():
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.active.clear()
+        with open(self.path, "w") as f:
+            for stack, n in self.samples.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+@contextmanager
+def profile(path, interval=PROFILE_INTERVAL):
+    profiler = SamplingProfiler(path, interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
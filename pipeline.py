@@ -0,0 +1,189 @@
+# pipeline.py
+
+import hashlib
+import json
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timezone
+import pandas as pd
+from backtest import run_backtest
+from fetch_data import fetch_stations, fetch_weather_data
+from history import load_aggregates
+from manifest import artifact_hash
+from metrics import instrumented
+from predict import predict_next_day
+from preprocess import preprocess_weather_data
+from store import FEATURES_TABLE
+from train_model import train_models
+
+# In-process DAG runner for the daily pipeline. Stages run as soon as their
+# dependencies have finished (independent stages in parallel), pass their outputs
+# to downstream stages in memory, and are skipped when the content hash of their
+# inputs matches their last successful run. Every run is recorded in RUNS_PATH.
+RUNS_PATH = "pipeline_runs.json"
+KEEP_RUNS = 30
+MAX_WORKERS = 4
+
+
+class Stage:
+
+    def __init__(self, name, func, deps=(), key=None):
+        # func(**outputs_of_deps) -> output; key() adds external inputs (e.g. today's date)
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.key = key
+
+
+def content_hash(value):
+    digest = hashlib.sha256()
+    if value is None:
+        pass
+    elif isinstance(value, pd.DataFrame):
+        digest.update(json.dumps([str(c) for c in value.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def read_runs(path=RUNS_PATH):
+    if not os.path.exists(path):
+        return {"last_success": {}, "runs": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_runs(runs, path=RUNS_PATH):
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w") as f:
+        json.dump(runs, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_stages(stages, max_workers=MAX_WORKERS, runs_path=RUNS_PATH, force=False):
+    runs = read_runs(runs_path)
+    last_success = runs["last_success"]
+    record = {"started": datetime.now(timezone.utc).isoformat(), "stages": {}}
+    outputs, output_hashes, status = {}, {}, {}
+
+    def execute(stage):
+        inputs = {dep: outputs.get(dep) for dep in stage.deps}
+        start = time.perf_counter()
+        output = stage.func(**inputs)
+        return output, time.perf_counter() - start
+
+    remaining = {stage.name: stage for stage in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while remaining or running:
+            for name, stage in list(remaining.items()):
+                if any(dep not in status for dep in stage.deps):
+                    continue
+                del remaining[name]
+                if any(status[dep] == "failed" or status[dep] == "blocked" for dep in stage.deps):
+                    status[name] = "blocked"
+                    record["stages"][name] = {"status": "blocked"}
+                    print(f"⏭️ {name}: blocked by a failed dependency")
+                    continue
+
+                # Input hash: upstream output hashes plus any external key
+                key = stage.key() if stage.key else None
+                input_hash = content_hash([[output_hashes[dep] for dep in stage.deps], key])
+                previous = last_success.get(name, {})
+                if not force and previous.get("input_hash") == input_hash:
+                    status[name] = "skipped"
+                    output_hashes[name] = previous["output_hash"]
+                    record["stages"][name] = {"status": "skipped", "input_hash": input_hash}
+                    print(f"⏭️ {name}: inputs unchanged, skipped")
+                    continue
+                running[pool.submit(execute, stage)] = (name, input_hash)
+
+            if not running:
+                if remaining:
+                    missing = {dep for stage in remaining.values() for dep in stage.deps} - set(status) - set(remaining)
+                    raise ValueError(f"Stages depend on undefined stages: {sorted(missing)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, input_hash = running.pop(future)
+                try:
+                    output, seconds = future.result()
+                except Exception as e:
+                    status[name] = "failed"
+                    record["stages"][name] = {"status": "failed", "input_hash": input_hash, "error": repr(e)}
+                    print(f"❌ {name} failed:\n{traceback.format_exc()}")
+                    continue
+                status[name] = "success"
+                outputs[name] = output
+                output_hashes[name] = content_hash(output)
+                last_success[name] = {"input_hash": input_hash, "output_hash": output_hashes[name]}
+                record["stages"][name] = {"status": "success", "seconds": round(seconds, 3), "input_hash": input_hash}
+                print(f"✅ {name} finished in {seconds:.1f}s")
+
+    record["finished"] = datetime.now(timezone.utc).isoformat()
+    runs["runs"] = (runs["runs"] + [record])[-KEEP_RUNS:]
+    write_runs(runs, runs_path)
+    return record
+
+
+# ---------- The daily weather pipeline ----------
+def _fetch():
+    return fetch_weather_data(incremental=True)
+
+
+def _fetch_stations():
+    # Per station, only the days after its latest stored date
+    fetch_stations(incremental=True)
+    return artifact_hash("stations")
+
+
+def _preprocess(fetch):
+    return preprocess_weather_data(incremental=True, new_rows=fetch)
+
+
+def _aggregates(preprocess):
+    load_aggregates()
+    return artifact_hash(FEATURES_TABLE)
+
+
+def _backtest(preprocess, train):
+    # Only cutoffs not yet in the backtest cache are computed. Runs after training,
+    # so the two process pools do not compete for the cores.
+    return run_backtest()
+
+
+def _train(preprocess):
+    train_models(warm_start=True)
+    return artifact_hash("models")
+
+
+def _predict(train):
+    return predict_next_day()
+
+
+def daily_stages(stations=False):
+    stages = [
+        Stage("fetch", _fetch, key=lambda: date.today().isoformat()),
+        Stage("preprocess", _preprocess, deps=["fetch"]),
+        Stage("train", _train, deps=["preprocess"]),
+        Stage("aggregates", _aggregates, deps=["preprocess"]),
+        Stage("backtest", _backtest, deps=["preprocess", "train"]),
+        Stage("predict", _predict, deps=["train"]),
+    ]
+    if stations:
+        # Independent of the main chain, so it runs alongside it
+        stages.append(Stage("fetch_stations", _fetch_stations, key=lambda: date.today().isoformat()))
+    return stages
+
+
+@instrumented("pipeline")
+def run_pipeline(stations=False, force=False):
+    return run_stages(daily_stages(stations), force=force)
+
+if __name__ == "__main__":
+    import sys
+    run_pipeline(stations="--stations" in sys.argv, force="--force" in sys.argv)
@@ -1,7 +1,7 @@
-import pandas as pd
-import joblib
-from datetime import datetime
-import os
+from features import LAG_FEATURES, history_days
+from forecast import forecast_frame, load_models
+from metrics import instrumented
+from store import FEATURES_TABLE, read_latest
 
 
 
@@ -19,40 +19,44 @@ WEATHER_CODE_MAP = {
 }
 
 
-def predict_next_day():
-    # Load the preprocessed data
-    df = pd.read_csv("preprocessed_weather.csv", parse_dates=["date"])
-    
-    # Sort by date and select the latest row
-    latest = df.sort_values("date").iloc[-1:]
-    
-    # Extract feature columns
-    X_new = latest[[col for col in df.columns if ("lag" in col and "description" not in col)]]
+@instrumented("predict")
+def predict_next_day(models=None, feature_cols=None):
+    # Load only the last days of the preprocessed data needed for the lag features
+    latest = read_latest(FEATURES_TABLE, n=history_days(), columns=["date"] + LAG_FEATURES)
     
     # Load the trained models
-    model_temp = joblib.load("model_temperature.pkl")
-    model_precip = joblib.load("model_precipitation.pkl")
-    model_weather = joblib.load("model_weather_code.pkl")
+    if models is None:
+        models, feature_cols = load_models()
     
-    # Make predictions
-    temp_pred = model_temp.predict(X_new)[0]
-    precip_pred = model_precip.predict(X_new)[0]
-    weather_pred_code = model_weather.predict(X_new)[0]
+    # Make predictions (with the spread of the forest's trees)
+    forecast = forecast_frame(models, feature_cols, latest, horizon=1, probabilistic=True).iloc[0]
+    temp_pred = forecast["temperature_2m_mean"]
+    precip_pred = forecast["precipitation_sum"]
+    weather_pred_code = int(forecast["weather_code"])
     weather_pred_desc = WEATHER_CODE_MAP.get(weather_pred_code, "Unknown")
     
     # Display predictions
     print("📅 Forecast for next day:")
-    print(f"🌡️ Temperature: {temp_pred:.2f}°C")
-    print(f"🌧️ Precipitation: {precip_pred:.2f} mm")
+    print(f"🌡️ Temperature: {temp_pred:.2f}°C "
+          f"(80% interval {forecast['temperature_2m_mean_q10']:.2f}–{forecast['temperature_2m_mean_q90']:.2f})")
+    print(f"🌧️ Precipitation: {precip_pred:.2f} mm "
+          f"(80% interval {forecast['precipitation_sum_q10']:.2f}–{forecast['precipitation_sum_q90']:.2f}, "
+          f"P(>10 mm) {forecast['precipitation_prob_10mm'] * 100:.0f}%)")
     print(f"☁️ Weather: {weather_pred_desc} (Code: {weather_pred_code})")
 
     
     prediction_row = {
-        "date": datetime.today().date().isoformat(),
+        "date": forecast["date"].date().isoformat(),
         "temperature_2m_mean": round(temp_pred, 2),
         "precipitation_sum": round(precip_pred, 2),
+        "temperature_2m_mean_q10": round(forecast["temperature_2m_mean_q10"], 2),
+        "temperature_2m_mean_q90": round(forecast["temperature_2m_mean_q90"], 2),
+        "precipitation_sum_q10": round(forecast["precipitation_sum_q10"], 2),
+        "precipitation_sum_q90": round(forecast["precipitation_sum_q90"], 2),
+        "precipitation_prob_10mm": round(forecast["precipitation_prob_10mm"], 2),
         "weather_description": weather_pred_desc
     }
+    return prediction_row
 
 
 if __name__ == "__main__":
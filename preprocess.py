@@ -1,7 +1,14 @@
 # preprocess.py
 
+import os
+import joblib
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from metrics import instrumented
+from features import build_features, compact_dtypes, history_days, memory_mb, wide_memory_mb
+from store import FEATURES_TABLE, HISTORY_TABLE, append_table, read_table, table_exists, write_table
+
+# Incremental state: watermark, trailing raw rows for the lags and the category encoding
+STATE_PATH = "preprocess_state.pkl"
 
 # Weather code to description mapping
 WEATHER_CODE_MAP = {
@@ -17,37 +24,91 @@ WEATHER_CODE_MAP = {
     95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
 }
 
-def preprocess_weather_data(input_path="historical_weather_daily.csv", output_path="preprocessed_weather.csv"):
-    df = pd.read_csv(input_path, parse_dates=["date"])
+def encode_labels(values, classes):
+    # Stable label encoding: known labels keep their code, unseen labels are
+    # appended in sorted order (so a fresh fit matches LabelEncoder)
+    classes = list(classes)
+    unseen = sorted(set(values.dropna().unique()) - set(classes))
+    classes += unseen
+    codes = values.map({label: code for code, label in enumerate(classes)})
+    return codes, classes
+
 
+def add_features(df, classes):
     # Map weather code to description
     df["weather_description"] = df["weather_code"].map(WEATHER_CODE_MAP)
 
-    # Create lag features
-    lag_features = [
-        "temperature_2m_mean", "temperature_2m_max",
-        "relative_humidity_2m_mean", "precipitation_sum", "weather_code",
-        "wind_speed_10m_mean", "wind_gusts_10m_mean", "surface_pressure_mean",
-        "daylight_duration", "sunshine_duration", "dew_point_2m_mean",
-        "cloud_cover_mean", "pressure_msl_mean"
-    ]
-
-    for col in lag_features:
-        df[f"{col}_lag1"] = df[col].shift(7)
+    # Create lag and rolling-window features (see features.py) in one vectorized pass
+    df = pd.concat([df, build_features(df)], axis=1)
 
     # Lag for weather description
-    df["weather_description_lag1"] = df["weather_description"].shift(7)
+    df["weather_description_lag1"] = df["weather_description"].shift(1)
 
     # Encode weather description lag
-    le = LabelEncoder()
-    df["weather_description_lag1_encoded"] = le.fit_transform(df["weather_description_lag1"].astype(str))
+    df["weather_description_lag1_encoded"], classes = encode_labels(df["weather_description_lag1"], classes)
+    return compact_dtypes(df), classes
+
+
+def load_state(state_path=STATE_PATH):
+    if not os.path.exists(state_path):
+        return None
+    return joblib.load(state_path)
+
+
+def save_state(raw, classes, state_path=STATE_PATH):
+    state = {
+        "watermark": raw["date"].max(),
+        "window": raw.tail(history_days()).reset_index(drop=True),
+        "classes": classes,
+    }
+    tmp_path = f"{state_path}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, state_path)
+
+
+@instrumented("preprocess")
+def preprocess_weather_data(input_table=HISTORY_TABLE, output_table=FEATURES_TABLE, incremental=False,
+                            state_path=STATE_PATH, new_rows=None):
+    # Returns the feature rows written. In incremental mode `new_rows` may pass freshly
+    # fetched raw rows in memory; they are used if they start right after the watermark.
+    state = load_state(state_path)
+    classes = state["classes"] if state is not None else []
+
+    if incremental and state is not None and table_exists(output_table):
+        watermark = state["watermark"]
+        if new_rows is None or new_rows.empty or new_rows["date"].min() > watermark + pd.Timedelta(days=1):
+            # Only read history after the watermark; the stored window feeds the lags
+            new_rows = read_table(input_table, start=watermark)
+        new_rows = new_rows[new_rows["date"] > watermark]
+        # Fresh API rows may carry a coarser timestamp unit than the stored window
+        new_rows = new_rows.assign(date=new_rows["date"].dt.as_unit(state["window"]["date"].dt.unit))
+        if new_rows.empty:
+            print(f"✅ Preprocessed data already up to date ({watermark.date()})")
+            return new_rows
+
+        raw = pd.concat([state["window"], new_rows[state["window"].columns]], ignore_index=True)
+        df, classes = add_features(raw.copy(), classes)
+        df = df[df["date"] > watermark].dropna()
+
+        append_table(df, output_table)
+        save_state(raw, classes, state_path)
+        print(f"✅ Preprocessed {len(new_rows)} new day(s) into table '{output_table}'")
+        return df
+
+    raw = read_table(input_table)
+    df, classes = add_features(raw.copy(), classes)
 
     # Drop NaN rows caused by lagging
     df.dropna(inplace=True)
+    print(f"📦 Features: {len(df.columns)} columns, {wide_memory_mb(df):.1f} MB as float64/object "
+          f"-> {memory_mb(df):.1f} MB as float32/category")
 
     # Save processed dataset
-    df.to_csv(output_path, index=False)
-    print(f"✅ Preprocessed data saved to '{output_path}'")
+    write_table(df, output_table)
+    save_state(raw, classes, state_path)
+    print(f"✅ Preprocessed data saved to table '{output_table}'")
+    return df
 
 if __name__ == "__main__":
-    preprocess_weather_data()
+    import sys
+    preprocess_weather_data(incremental="--full" not in sys.argv)
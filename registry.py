@@ -0,0 +1,209 @@
+# registry.py
+
+import argparse
+import io
+import json
+import os
+import time
+import uuid
+import joblib
+import numpy as np
+from sklearn.ensemble import (HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+                              RandomForestClassifier, RandomForestRegressor)
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils.class_weight import compute_class_weight
+from artifacts import CompactForest, flatten_forest, is_forest
+
+# Model backends that train_model.py can fit for each target, and the selection of
+# one backend per target. `python registry.py` fits every backend on the same split,
+# measures accuracy, fit time, artifact size and prediction latency, picks the most
+# accurate backend within the budget, writes SELECTION_PATH and saves the chosen
+# models where forecast.load_models() reads them.
+SELECTION_PATH = "model_selection.json"
+DEFAULT_BACKEND = "random_forest"
+
+# Budget per model: single-row predict latency and artifact size (compact export for forests)
+LATENCY_BUDGET_MS = 5.0
+SIZE_BUDGET_MB = 50.0
+
+BATCH_ROWS = 1000
+LATENCY_REPEATS = 50
+
+
+def balanced_class_weights(y):
+    classes = np.unique(y)
+    class_weights = compute_class_weight(class_weight="balanced", classes=classes, y=y)
+    return {cls: w for cls, w in zip(classes, class_weights)}
+
+
+# ---------- Backends: (classifier?, training targets, n_jobs) -> unfitted model ----------
+def _random_forest(classifier, y_train, n_jobs):
+    # 100 fully grown trees
+    if classifier:
+        return RandomForestClassifier(random_state=42, class_weight=balanced_class_weights(y_train), n_jobs=n_jobs)
+    return RandomForestRegressor(random_state=42, n_jobs=n_jobs)
+
+
+def _limited_forest(classifier, y_train, n_jobs):
+    # Depth- and leaf-limited trees: a fraction of the nodes, so faster to fit, load and walk
+    params = {"max_depth": 12, "min_samples_leaf": 5, "random_state": 42, "n_jobs": n_jobs}
+    if classifier:
+        return RandomForestClassifier(class_weight=balanced_class_weights(y_train), **params)
+    return RandomForestRegressor(**params)
+
+
+def _hist_gradient_boosting(classifier, y_train, n_jobs):
+    # Features are binned into at most 255 buckets before boosting
+    if classifier:
+        return HistGradientBoostingClassifier(max_bins=255, class_weight="balanced", random_state=42)
+    return HistGradientBoostingRegressor(max_bins=255, random_state=42)
+
+
+def _linear(classifier, y_train, n_jobs):
+    if classifier:
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000, class_weight="balanced"))
+    return make_pipeline(StandardScaler(), Ridge(alpha=1.0))
+
+
+BACKENDS = {
+    "random_forest": _random_forest,
+    "limited_forest": _limited_forest,
+    "hist_gradient_boosting": _hist_gradient_boosting,
+    "linear": _linear,
+}
+
+
+def make_model(name, backend, y_train, n_jobs=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](name == "weather_code", y_train, n_jobs)
+
+
+def read_selection(path=SELECTION_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def selected_backend(name, path=SELECTION_PATH):
+    return read_selection(path).get("selected", {}).get(name, DEFAULT_BACKEND)
+
+
+# ---------- Measurements ----------
+def deployed(model):
+    # The predictor forecast.load_models() would serve for this model
+    return CompactForest(*flatten_forest(model)) if is_forest(model) else model
+
+
+def artifact_size_mb(model):
+    if is_forest(model):
+        arrays, _ = flatten_forest(model)
+        return sum(array.nbytes for array in arrays.values()) / 2**20
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell() / 2**20
+
+
+def predict_latency_ms(predictor, X, repeats=LATENCY_REPEATS, batch_rows=BATCH_ROWS):
+    # Median single-row latency and best-of-3 latency of one batch
+    predictor.predict(X[:1])
+    single = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        predictor.predict(X[i % len(X)][None, :])
+        single.append(time.perf_counter() - start)
+    batch = X[:batch_rows]
+    batch_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        predictor.predict(batch)
+        batch_times.append(time.perf_counter() - start)
+    return float(np.median(single)) * 1000, min(batch_times) * 1000, len(batch)
+
+
+def compare_backends(backends=None, n_jobs=None, max_workers=None):
+    # Fit every backend for every target on the split train_models() uses
+    from train_model import MODELS, load_training_data, run_fits, split_rows, worker_counts
+
+    df, feature_cols, X, targets = load_training_data()
+    train_idx, test_idx = split_rows(len(X))
+    X_train, X_test = X[train_idx], X[test_idx]
+    max_workers, n_jobs = worker_counts(max_workers, n_jobs)
+
+    candidates, fitted = [], {}
+    for backend in backends or list(BACKENDS):
+        jobs = {name: (make_model(name, backend, targets[name][train_idx], n_jobs), X_train,
+                       targets[name][train_idx], X_test, targets[name][test_idx]) for name in MODELS}
+        for name, (model, score, seconds) in run_fits(jobs, max_workers).items():
+            single_ms, batch_ms, batch_rows = predict_latency_ms(deployed(model), X_test)
+            candidate = {
+                "model": name,
+                "backend": backend,
+                "metric": "accuracy" if name == "weather_code" else "rmse",
+                "score": float(score),
+                "fit_seconds": round(seconds, 3),
+                "size_mb": round(artifact_size_mb(model), 3),
+                "single_ms": round(single_ms, 3),
+                "batch_ms": round(batch_ms, 3),
+                "batch_rows": batch_rows,
+            }
+            candidates.append(candidate)
+            fitted[name, backend] = model
+            print(f"🧪 {name:<13} {backend:<23} {candidate['metric']} {candidate['score']:.4f}  "
+                  f"fit {seconds:6.1f}s  {candidate['size_mb']:8.2f} MB  "
+                  f"{single_ms:7.2f} ms/row  {batch_ms:8.2f} ms/{batch_rows} rows")
+    return candidates, fitted, (df, feature_cols)
+
+
+def select_backends(candidates, latency_budget_ms=LATENCY_BUDGET_MS, size_budget_mb=SIZE_BUDGET_MB):
+    # Per target: the most accurate candidate within budget, else the fastest one
+    selected = {}
+    for name in dict.fromkeys(c["model"] for c in candidates):
+        rows = [c for c in candidates if c["model"] == name]
+        within = [c for c in rows if c["single_ms"] <= latency_budget_ms and c["size_mb"] <= size_budget_mb]
+        if len(within) == 0:
+            best = min(rows, key=lambda c: c["single_ms"])
+            print(f"⚠️ {name}: no backend within budget, using the fastest ({best['backend']})")
+        elif rows[0]["metric"] == "accuracy":
+            best = max(within, key=lambda c: c["score"])
+        else:
+            best = min(within, key=lambda c: c["score"])
+        selected[name] = best["backend"]
+    return selected
+
+
+def write_selection(selection, path=SELECTION_PATH):
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w") as f:
+        json.dump(selection, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_registry(backends=None, latency_budget_ms=LATENCY_BUDGET_MS, size_budget_mb=SIZE_BUDGET_MB):
+    from train_model import save_models
+
+    candidates, fitted, (df, feature_cols) = compare_backends(backends)
+    selected = select_backends(candidates, latency_budget_ms, size_budget_mb)
+    write_selection({
+        "budget": {"latency_ms": latency_budget_ms, "size_mb": size_budget_mb},
+        "selected": selected,
+        "candidates": candidates,
+    })
+    for name, backend in selected.items():
+        print(f"✅ {name}: {backend}")
+
+    # The selected models were fitted on the same split train_models() uses, so save them as they are
+    save_models({name: fitted[name, backend] for name, backend in selected.items()},
+                feature_cols, df["date"].max(), selected)
+    return selected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model backends and select one per target.")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument("--size-mb", type=float, default=SIZE_BUDGET_MB)
+    args = parser.parse_args()
+    run_registry(args.backends, args.latency_ms, args.size_mb)
@@ -1,20 +1,24 @@
 import schedule
 import time
-import os
 from datetime import datetime
+import pipeline
 
 def run_pipeline():
     print(f"\n--- Running Pipeline at {datetime.now()} ---")
-    os.system("python fetch_data.py")
-    os.system("python preprocess.py")
-    os.system("python train_model.py")
-    os.system("python predict.py")
-    print("--- Pipeline Completed ---\n")
+    # fetch -> preprocess -> train -> predict in one process (see pipeline.py)
+    record = pipeline.run_pipeline()
+    failed = [name for name, stage in record["stages"].items() if stage["status"] in ("failed", "blocked")]
+    if failed:
+        print(f"--- Pipeline Failed: {', '.join(failed)} ---\n")
+    else:
+        print("--- Pipeline Completed ---\n")
 
-# Schedule it to run every day at 3:00 AM
-schedule.every().day.at("03:00").do(run_pipeline)
+if __name__ == "__main__":
+    # Guarded: training and backtest workers re-import the main module when they start
+    # Schedule it to run every day at 3:00 AM
+    schedule.every().day.at("03:00").do(run_pipeline)
 
-# Keep the script running
-while True:
-    schedule.run_pending()
-    time.sleep(60)
+    # Keep the script running
+    while True:
+        schedule.run_pending()
+        time.sleep(60)
@@ -0,0 +1,234 @@
+# serve.py
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from features import LAG_FEATURES, history_days
+from forecast import forecast_frame, load_models
+from manifest import version
+from metrics import export
+from store import FEATURES_TABLE, read_table
+
+# Local HTTP/JSON forecast service.
+#   POST /forecast  {"base_date": "2025-04-10", "horizon": 3}  (both optional)
+#   GET  /health
+# Concurrent requests are coalesced into micro-batches that share one vectorized
+# forecast call, and models are hot-swapped when the manifest version changes.
+HOST = "127.0.0.1"
+PORT = 8000
+LOG_PATH = "requests.jsonl"
+
+MAX_BATCH = 64
+MAX_WAIT_MS = 5
+MAX_HORIZON = 7
+RELOAD_INTERVAL = 10
+
+
+def artifacts_version():
+    return version(["models", FEATURES_TABLE])
+
+
+def load_state():
+    # Everything a batch needs, swapped as one reference on reload
+    models, feature_cols = load_models()
+    df = read_table(FEATURES_TABLE, columns=["date"] + LAG_FEATURES)
+    df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None).dt.normalize()
+    return {
+        "version": artifacts_version(),
+        "models": models,
+        "feature_cols": feature_cols,
+        "df": df,
+        "dates": pd.DatetimeIndex(df["date"]),
+    }
+
+
+class ForecastService:
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, log_path=LOG_PATH):
+        self.state = load_state()
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.log_path = log_path
+        self.log_lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.stopped = threading.Event()
+
+    def start(self, reload_interval=RELOAD_INTERVAL):
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        threading.Thread(target=self._reload_loop, args=(reload_interval,), daemon=True).start()
+
+    def submit(self, request):
+        # Queue a request for the next micro-batch; returns a Future with the response
+        future = Future()
+        self.pending.put((request, future))
+        return future
+
+    def _reload_loop(self, interval):
+        while not self.stopped.wait(interval):
+            # Prediction latency histograms (see metrics.py) for scraping
+            export()
+            if artifacts_version() == self.state["version"]:
+                continue
+            try:
+                state = load_state()
+            except Exception as e:
+                print(f"⚠️ Reload failed, keeping version {self.state['version']}: {e}")
+                continue
+            # A single reference assignment: batches see either the old or the new state
+            self.state = state
+            print(f"🔄 Loaded artifacts version {state['version']}")
+
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self.stopped.is_set():
+            batch = self._next_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _parse(self, request, state):
+        horizon = int(request.get("horizon", 1))
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+        base_date = pd.Timestamp(request.get("base_date") or state["dates"][-1]).tz_localize(None).normalize()
+        if base_date not in state["dates"]:
+            raise ValueError(f"No data for base date {base_date.date()}")
+        # Checked here, so one request without enough history cannot fail its whole batch
+        history = history_days()
+        position = state["dates"].get_loc(base_date)
+        first = position - (history - 1)
+        if first < 0 or base_date - state["dates"][first] != pd.Timedelta(days=history - 1):
+            raise ValueError(f"Base date {base_date.date()} needs {history} consecutive days of history")
+        return base_date, horizon
+
+    def _run_batch(self, batch):
+        state = self.state
+        valid = []
+        for request, future in batch:
+            try:
+                valid.append((future, *self._parse(request, state)))
+            except (TypeError, ValueError) as e:
+                future.set_exception(ValueError(str(e)))
+        if len(valid) == 0:
+            return
+
+        # One forecast call for the whole batch, at the longest requested horizon
+        horizon = max(h for _, _, h in valid)
+        forecasts = forecast_frame(state["models"], state["feature_cols"], state["df"], horizon=horizon,
+                                   base_dates=[base_date for _, base_date, _ in valid])
+        for i, (future, base_date, h) in enumerate(valid):
+            rows = forecasts.iloc[i * horizon:i * horizon + h]
+            future.set_result({
+                "base_date": base_date.date().isoformat(),
+                "model_version": state["version"],
+                "batch_size": len(valid),
+                "forecast": [
+                    {
+                        "date": row.date.date().isoformat(),
+                        "temperature_2m_mean": round(float(row.temperature_2m_mean), 2),
+                        "precipitation_sum": round(float(row.precipitation_sum), 2),
+                        "weather_code": int(row.weather_code),
+                        "weather_description": row.weather_description,
+                    }
+                    for row in rows.itertuples()
+                ],
+            })
+
+    def log(self, request, response, status, latency_ms):
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "request": request,
+            "status": status,
+            "latency_ms": round(latency_ms, 3),
+            "response": response,
+        }
+        with self.log_lock, open(self.log_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def make_handler(service):
+
+    class ForecastHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, Nagle's algorithm
+        # and delayed ACKs add ~40 ms to every keep-alive response
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "model_version": service.state["version"]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/forecast":
+                self._send(404, {"error": "not found"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "invalid JSON"})
+                return
+            if not isinstance(request, dict):
+                self._send(400, {"error": "request body must be a JSON object"})
+                return
+            try:
+                status, response = 200, service.submit(request).result()
+            except ValueError as e:
+                status, response = 400, {"error": str(e)}
+            except Exception as e:
+                status, response = 500, {"error": str(e)}
+            self._send(status, response)
+            service.log(request, response, status, (time.perf_counter() - start) * 1000)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ForecastHandler
+
+
+def serve(host=HOST, port=PORT, **kwargs):
+    service = ForecastService(**kwargs)
+    service.start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"🚀 Serving forecasts on http://{host}:{port} (artifacts version {service.state['version']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stopped.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,265 @@
+# store.py
+
+import os
+import shutil
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from manifest import artifact_hash, file_digest, record
+
+# Columnar storage shared by all pipeline stages: one Parquet file per year,
+# e.g. data/features/v-<id>/year=1999/part.parquet, where data/features/CURRENT
+# names the current version directory
+STORE_ROOT = "data"
+POINTER_FILE = "CURRENT"
+
+HISTORY_TABLE = "historical"
+STATIONS_TABLE = "stations"
+FEATURES_TABLE = "features"
+
+# CSVs written by earlier versions of the pipeline, migrated by `python store.py`
+LEGACY_CSVS = {
+    HISTORY_TABLE: "historical_weather_daily.csv",
+    STATIONS_TABLE: "historical_weather_stations.csv",
+    FEATURES_TABLE: "preprocessed_weather.csv",
+}
+
+
+def table_path(name, root=STORE_ROOT):
+    return os.path.join(root, name)
+
+
+# ---------- Versioned directories ----------
+# A writer builds each version in its own v-<id> directory and then atomically switches
+# the POINTER_FILE, so a reader always resolves a complete version. Used for tables here
+# and for the compact model exports in artifacts.py.
+def current_version(path):
+    # Directory of the current version under `path`; `path` itself when it has no
+    # pointer (written before versioning)
+    try:
+        with open(os.path.join(path, POINTER_FILE)) as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+def new_version(path):
+    version_path = os.path.join(path, f"v-{uuid.uuid4().hex}")
+    os.makedirs(version_path)
+    return version_path
+
+
+def publish_version(path, version_path, previous):
+    # Point `path` at `version_path`. The previous version stays for readers that resolved
+    # it before the switch; anything older (including unversioned content) is removed.
+    pointer = os.path.join(path, POINTER_FILE)
+    tmp_pointer = f"{pointer}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_pointer, "w") as f:
+        f.write(os.path.basename(version_path))
+    os.replace(tmp_pointer, pointer)
+
+    for entry in os.listdir(path):
+        if entry in (os.path.basename(version_path), os.path.basename(previous)) or entry.startswith(POINTER_FILE):
+            continue
+        if entry.startswith("v-") or previous != path:
+            entry_path = os.path.join(path, entry)
+            if os.path.isdir(entry_path):
+                shutil.rmtree(entry_path, ignore_errors=True)
+            else:
+                os.remove(entry_path)
+
+
+def read_current(path, read):
+    # read(version_path) of the current version. A reader overtaken by two writes finds
+    # its version pruned; it then retries on the version that is current now.
+    version_path = current_version(path)
+    while True:
+        try:
+            return read(version_path)
+        except FileNotFoundError:
+            latest = current_version(path)
+            if latest == version_path:
+                raise
+            version_path = latest
+
+
+def _current_path(name, root=STORE_ROOT):
+    return current_version(table_path(name, root))
+
+
+def _partition_file(path, year):
+    return os.path.join(path, f"year={year}", "part.parquet")
+
+
+def _partition_years(path):
+    if not os.path.isdir(path):
+        return []
+    years = []
+    for entry in os.listdir(path):
+        if entry.startswith("year=") and os.path.exists(os.path.join(path, entry, "part.parquet")):
+            years.append(int(entry[len("year="):]))
+    return sorted(years)
+
+
+def _table_keys(df):
+    return ["station", "date"] if "station" in df.columns else ["date"]
+
+
+def _normalize_dates(df):
+    # One timestamp unit everywhere, so frames and partitions concatenate cleanly
+    return df.assign(date=pd.to_datetime(df["date"]).dt.as_unit("ns"))
+
+
+def _plain_categories(df):
+    # Categoricals are stored as plain values: partitions written at different times
+    # have different category sets, and Parquet cannot merge their dictionaries
+    categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    return df.astype({col: df[col].cat.categories.dtype for col in categorical}) if categorical else df
+
+
+def _decode_dictionaries(table):
+    # Partitions written before categoricals were stored as plain values
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
+
+
+def _write_partition(df, file_path):
+    # Write next to the target and rename over it, so readers never see a partial file
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.tmp-{uuid.uuid4().hex}"
+    pq.write_table(pa.Table.from_pandas(_plain_categories(df), preserve_index=False), tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def table_exists(name, root=STORE_ROOT):
+    return len(_partition_years(_current_path(name, root))) > 0
+
+
+def write_table(df, name, root=STORE_ROOT):
+    # Replace the whole table: build a new version directory, then atomically point
+    # the table at it. The previous version stays for readers that resolved it before
+    # the switch and is removed by the next write.
+    path = table_path(name, root)
+    previous = current_version(path)
+    current = new_version(path)
+    df = _normalize_dates(df).sort_values(_table_keys(df), ignore_index=True)
+    for year, part in df.groupby(df["date"].dt.year, sort=True):
+        _write_partition(part, _partition_file(current, year))
+    publish_version(path, current, previous)
+    record(name, file_digest([_partition_file(current, y) for y in _partition_years(current)]))
+
+
+def append_table(df, name, root=STORE_ROOT):
+    # Upsert rows by key; only the year partitions touched by `df` are rewritten
+    keys = _table_keys(df)
+    df = _normalize_dates(df)
+    path = _current_path(name, root)
+    written = []
+    for year, part in df.groupby(df["date"].dt.year, sort=True):
+        file_path = _partition_file(path, year)
+        if os.path.exists(file_path):
+            existing = pq.read_table(file_path, memory_map=True).to_pandas()
+            part = pd.concat([existing, part], ignore_index=True)
+        part = part.drop_duplicates(keys, keep="last").sort_values(keys, ignore_index=True)
+        _write_partition(part, file_path)
+        written.append(file_path)
+    record(name, file_digest(written, previous=artifact_hash(name)))
+
+
+def _date_bound(value, like):
+    value = pd.Timestamp(value)
+    tz = getattr(like.dt, "tz", None)
+    if tz is not None and value.tzinfo is None:
+        return value.tz_localize(tz)
+    if tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
+
+
+def read_table(name, columns=None, start=None, end=None, root=STORE_ROOT):
+    # Column-pruned, date-range read; partitions outside [start, end] are never opened
+    return read_current(table_path(name, root), lambda path: _read_version(path, name, columns, start, end, root))
+
+
+def _read_version(path, name, columns, start, end, root):
+    years = _partition_years(path)
+    if start is not None:
+        years = [y for y in years if y >= pd.Timestamp(start).year]
+    if end is not None:
+        years = [y for y in years if y <= pd.Timestamp(end).year]
+    if len(years) == 0:
+        raise FileNotFoundError(f"No data stored for table '{name}' in '{root}'")
+
+    # Multi-station tables are partitioned by year first: read the station column too,
+    # so the rows can be returned ordered by (station, date) like the table was written
+    keys = ["station", "date"] if "station" in pq.read_schema(_partition_file(path, years[0])).names else ["date"]
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(keys + list(columns)))
+    tables = [_decode_dictionaries(pq.read_table(_partition_file(path, y), columns=read_columns, memory_map=True))
+              for y in years]
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    if len(keys) > 1 and len(years) > 1:
+        df = df.sort_values(keys, kind="stable", ignore_index=True)
+
+    if start is not None:
+        df = df[df["date"] >= _date_bound(start, df["date"])]
+    if end is not None:
+        df = df[df["date"] <= _date_bound(end, df["date"])]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+def read_latest(name, n=1, columns=None, root=STORE_ROOT):
+    # Last `n` rows by date, reading partitions from the newest year backwards
+    frames = []
+    rows = 0
+    for year in reversed(_partition_years(_current_path(name, root))):
+        frame = read_table(name, columns=columns, start=f"{year}-01-01", end=f"{year}-12-31", root=root)
+        frames.insert(0, frame)
+        rows += len(frame)
+        if rows >= n:
+            break
+    if len(frames) == 0:
+        raise FileNotFoundError(f"No data stored for table '{name}' in '{root}'")
+    return pd.concat(frames, ignore_index=True).tail(n).reset_index(drop=True)
+
+
+def latest_date(name, root=STORE_ROOT):
+    path = _current_path(name, root)
+    years = _partition_years(path)
+    if len(years) == 0:
+        return None
+    dates = pq.read_table(_partition_file(path, years[-1]), columns=["date"], memory_map=True)
+    return dates.column("date").to_pandas().max()
+
+
+def latest_dates(name, key="station", root=STORE_ROOT):
+    # Watermark per `key` value (e.g. per station) of the keys in the newest year partition
+    path = _current_path(name, root)
+    years = _partition_years(path)
+    if len(years) == 0:
+        return {}
+    rows = pq.read_table(_partition_file(path, years[-1]), columns=[key, "date"], memory_map=True).to_pandas()
+    return rows.groupby(key, observed=True)["date"].max().to_dict()
+
+
+def migrate_csvs(root=STORE_ROOT):
+    # One-shot migration of the CSV hand-off files into the store
+    for name, csv_path in LEGACY_CSVS.items():
+        if not os.path.exists(csv_path):
+            continue
+        try:
+            df = pd.read_csv(csv_path, parse_dates=["date"])
+        except (ValueError, KeyError):
+            print(f"⚠️ Skipping '{csv_path}' (not a data file, is Git LFS pulled?)")
+            continue
+        write_table(df, name, root)
+        print(f"✅ Migrated '{csv_path}' to '{table_path(name, root)}' ({len(df)} rows)")
+
+if __name__ == "__main__":
+    migrate_csvs()
@@ -0,0 +1,187 @@
+# synthetic.py
+
+import threading
+import zlib
+import numpy as np
+import pandas as pd
+from fetch_data import DAILY_VARIABLES, HISTORY_START, STATIONS
+
+# Deterministic synthetic weather in the 31-column schema fetch_data.py produces,
+# for benchmarks and for running the fetch code against a local stand-in of the API.
+HISTORY_YEARS = 85
+
+
+def synthetic_station(station=0, start=HISTORY_START, years=HISTORY_YEARS, seed=42):
+    n_days = int(round(years * 365.25))
+    rng = np.random.default_rng([seed, station])
+    dates = pd.date_range(start, periods=n_days, freq="D", tz="UTC")
+    season = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    monsoon = np.clip(np.sin(season - 2.2), 0, None)  # wet from June to September
+
+    def noise(scale):
+        return rng.normal(0, scale, n_days)
+
+    temp_mean = 27.5 + 1.5 * np.sin(season - 1.2) - 1.5 * monsoon + noise(0.8)
+    temp_max = temp_mean + 4 + noise(0.6)
+    temp_min = temp_mean - 4 + noise(0.6)
+    precipitation = rng.gamma(0.4 + 2.5 * monsoon, 4 + 8 * monsoon) * (rng.random(n_days) < 0.35 + 0.6 * monsoon)
+    cloud_mean = np.clip(35 + 50 * monsoon + 2 * precipitation + noise(10), 0, 100)
+    humidity = np.clip(70 + 20 * monsoon + noise(4), 30, 100)
+    dew_point = temp_mean - (100 - humidity) / 5
+    wind_mean = np.abs(9 + 8 * monsoon + noise(2))
+    gusts_mean = wind_mean * 1.9 + np.abs(noise(2))
+    pressure_msl = 1010 - 4 * monsoon + noise(1.5)
+    surface_pressure = pressure_msl - 1.2 + noise(0.2)
+    daylight = 43200 + 2400 * np.sin(season - 1.4)
+    sunshine = np.clip(daylight * (1 - cloud_mean / 110) + noise(1500), 0, None)
+
+    # WMO weather codes derived from rain amount and cloud cover
+    codes = np.select(
+        [precipitation >= 30, precipitation >= 10, precipitation >= 2.5, precipitation >= 1,
+         precipitation > 0.1, cloud_mean >= 85, cloud_mean >= 60, cloud_mean >= 30],
+        [95, 65, 63, 61, 51, 3, 2, 1], default=0)
+
+    values = {
+        "weather_code": codes,
+        "temperature_2m_mean": temp_mean,
+        "daylight_duration": daylight,
+        "sunshine_duration": sunshine,
+        "precipitation_sum": precipitation,
+        "wind_speed_10m_max": wind_mean * 1.6 + np.abs(noise(1.5)),
+        "temperature_2m_min": temp_min,
+        "cloud_cover_mean": cloud_mean,
+        "dew_point_2m_mean": dew_point,
+        "apparent_temperature_mean": temp_mean + 3 + noise(0.5),
+        "apparent_temperature_max": temp_max + 4 + noise(0.6),
+        "apparent_temperature_min": temp_min + 2 + noise(0.6),
+        "temperature_2m_max": temp_max,
+        "wind_gusts_10m_max": gusts_mean * 1.5 + np.abs(noise(3)),
+        "dew_point_2m_max": dew_point + 1.5 + np.abs(noise(0.5)),
+        "dew_point_2m_min": dew_point - 1.5 - np.abs(noise(0.5)),
+        "cloud_cover_max": np.clip(cloud_mean + 25 + noise(5), 0, 100),
+        "cloud_cover_min": np.clip(cloud_mean - 30 + noise(5), 0, 100),
+        "relative_humidity_2m_mean": humidity,
+        "relative_humidity_2m_max": np.clip(humidity + 12 + noise(2), 0, 100),
+        "relative_humidity_2m_min": np.clip(humidity - 18 + noise(3), 0, 100),
+        "pressure_msl_mean": pressure_msl,
+        "pressure_msl_max": pressure_msl + 1.8 + np.abs(noise(0.4)),
+        "pressure_msl_min": pressure_msl - 1.8 - np.abs(noise(0.4)),
+        "wind_speed_10m_mean": wind_mean,
+        "wind_gusts_10m_min": np.abs(gusts_mean * 0.4 + noise(1)),
+        "wind_speed_10m_min": np.abs(wind_mean * 0.3 + noise(0.5)),
+        "wind_gusts_10m_mean": gusts_mean,
+        "surface_pressure_min": surface_pressure - 1.8 - np.abs(noise(0.4)),
+        "surface_pressure_max": surface_pressure + 1.8 + np.abs(noise(0.4)),
+        "surface_pressure_mean": surface_pressure,
+    }
+    df = pd.DataFrame({"date": dates})
+    for name in DAILY_VARIABLES:
+        df[name] = values[name].astype(np.float32)
+    return df
+
+
+def synthetic_history(scale=1, years=HISTORY_YEARS, seed=42):
+    # `scale` times the rows of an 85-year single-station history. Dates are stored as
+    # datetime64[ns], which ends in 2262, so larger scales are spread over `scale`
+    # stations (long format keyed by station and date) rather than over more years.
+    if scale == 1:
+        return synthetic_station(0, years=years, seed=seed)
+    frames = [synthetic_station(i, years=years, seed=seed) for i in range(scale)]
+    names = list(STATIONS) + [f"station_{i}" for i in range(len(STATIONS), scale)]
+    for name, frame in zip(names, frames):
+        frame.insert(0, "station", name)
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------- Stand-in for the Open-Meteo client ----------
+class _Variable:
+
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class _Daily:
+
+    def __init__(self, df):
+        self.df = df
+
+    def Time(self):
+        return int(self.df["date"].iloc[0].timestamp())
+
+    def TimeEnd(self):
+        return int(self.df["date"].iloc[-1].timestamp()) + 86400
+
+    def Interval(self):
+        return 86400
+
+    def Variables(self, i):
+        return _Variable(self.df[DAILY_VARIABLES[i]].to_numpy())
+
+
+class SyntheticResponse:
+    # Mirrors the parts of openmeteo_requests' WeatherApiResponse that fetch_data uses
+
+    def __init__(self, df, latitude=0.0, longitude=0.0):
+        self.df = df
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def Daily(self):
+        return _Daily(self.df)
+
+    def Latitude(self):
+        return self.latitude
+
+    def Longitude(self):
+        return self.longitude
+
+    def Elevation(self):
+        return 0.0
+
+    def Timezone(self):
+        return b"GMT"
+
+    def TimezoneAbbreviation(self):
+        return b"GMT"
+
+    def UtcOffsetSeconds(self):
+        return 0
+
+
+class SyntheticClient:
+    # Drop-in for openmeteo_requests.Client: fetch_weather_data(client=SyntheticClient())
+
+    def __init__(self, seed=42, end_date="2030-12-31"):
+        # Each station's series is generated once through end_date, so a date has the
+        # same values in every call whatever window is requested
+        self.seed = seed
+        self.end_date = pd.Timestamp(end_date, tz="UTC")
+        self.series = {}
+        self.calls = 0
+        # fetch_stations() calls the client from several threads
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def station_index(latitude, longitude):
+        # Stable per location, whatever order the stations are requested in: the
+        # position in STATIONS (as in synthetic_history), else a hash of the coordinates
+        for i, coordinates in enumerate(STATIONS.values()):
+            if coordinates == (latitude, longitude):
+                return i
+        return len(STATIONS) + zlib.crc32(f"{latitude:.4f},{longitude:.4f}".encode())
+
+    def weather_api(self, url, params):
+        key = (params["latitude"], params["longitude"])
+        with self.lock:
+            self.calls += 1
+            if key not in self.series:
+                years = ((self.end_date - pd.Timestamp(HISTORY_START, tz="UTC")).days + 1) / 365.25
+                self.series[key] = synthetic_station(self.station_index(*key), years=years, seed=self.seed)
+            df = self.series[key]
+        start = pd.Timestamp(params["start_date"], tz="UTC")
+        end = pd.Timestamp(params["end_date"], tz="UTC")
+        df = df[(df["date"] >= start) & (df["date"] <= end)].reset_index(drop=True)
+        return [SyntheticResponse(df, params["latitude"], params["longitude"])]
@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import os
+import sys
+import pytest
+
+# The pipeline modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Every stage reads and writes its tables, state and models relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,58 @@
+# tests/test_artifacts.py
+
+import json
+import os
+import threading
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from artifacts import compact_exists, export_model, flatten_forest, load_compact
+
+
+def test_reexport_never_hides_the_model(workdir):
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 4), dtype=np.float32)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, X.sum(axis=1))
+    export_model(model, "temperature")
+
+    errors, stop = [], threading.Event()
+
+    def load():
+        while not stop.is_set():
+            try:
+                assert compact_exists("temperature")
+                load_compact("temperature").predict(X[:5])
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=load) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for _ in range(20):
+        export_model(model, "temperature")
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    np.testing.assert_allclose(load_compact("temperature").predict(X), model.predict(X), rtol=1e-5)
+
+
+def test_export_replaces_an_unversioned_export(workdir):
+    # Exports written before versioning sit directly in compact_models/<model>/
+    rng = np.random.default_rng(1)
+    X = rng.random((200, 3), dtype=np.float32)
+    old = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 0])
+    new = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 1])
+    os.makedirs("compact_models/temperature")
+    arrays, meta = flatten_forest(old)
+    for key, array in arrays.items():
+        np.save(f"compact_models/temperature/{key}.npy", array)
+    with open("compact_models/temperature/meta.json", "w") as f:
+        json.dump(meta, f)
+    np.testing.assert_allclose(load_compact("temperature").predict(X), old.predict(X), rtol=1e-5)
+
+    export_model(new, "temperature")
+    export_model(new, "temperature")
+    np.testing.assert_allclose(load_compact("temperature").predict(X), new.predict(X), rtol=1e-5)
+    # The unversioned files are removed once they are no longer the previous version
+    assert not os.path.exists("compact_models/temperature/meta.json")
@@ -0,0 +1,99 @@
+# tests/test_fetch.py
+
+import numpy as np
+import pandas as pd
+from fetch_data import DAILY_VARIABLES, HISTORY_START, STATIONS, fetch_stations, fetch_weather_data
+from store import HISTORY_TABLE, STATIONS_TABLE, latest_date, read_table
+from synthetic import SyntheticClient, SyntheticResponse
+
+END_DATE = "1943-12-31"
+
+
+class LaggingClient(SyntheticClient):
+    # The archive's newest days come back with every variable missing
+    def __init__(self, last_observed, **kwargs):
+        super().__init__(**kwargs)
+        self.last_observed = pd.Timestamp(last_observed, tz="UTC")
+
+    def weather_api(self, url, params):
+        response = super().weather_api(url, params)[0]
+        df = response.df.copy()
+        df.loc[df["date"] > self.last_observed, DAILY_VARIABLES] = np.nan
+        return [SyntheticResponse(df, response.latitude, response.longitude)]
+
+
+def test_full_fetch(workdir):
+    fetched = fetch_weather_data(end_date=END_DATE, client=SyntheticClient(end_date=END_DATE))
+    stored = read_table(HISTORY_TABLE)
+    assert len(stored) == len(fetched) == (pd.Timestamp(END_DATE) - pd.Timestamp(HISTORY_START)).days + 1
+    assert stored["date"].is_unique
+
+
+def test_incremental_append_and_idempotent_rerun(workdir):
+    client = SyntheticClient(end_date=END_DATE)
+    fetch_weather_data(end_date="1943-06-30", client=client)
+
+    new_rows = fetch_weather_data(incremental=True, end_date=END_DATE, client=client)
+    assert new_rows["date"].min() == pd.Timestamp("1943-07-01", tz="UTC")
+    assert len(new_rows) == 184
+
+    calls = client.calls
+    assert fetch_weather_data(incremental=True, end_date=END_DATE, client=client).empty
+    assert client.calls == calls  # up to date: no request at all
+
+    # Same rows as one full fetch, no duplicate dates
+    stored = read_table(HISTORY_TABLE)
+    full = fetch_weather_data(end_date=END_DATE, client=client, table="full")
+    assert stored["date"].is_unique
+    pd.testing.assert_frame_equal(stored, read_table("full"))
+    assert len(full) == len(stored)
+
+
+def test_trailing_missing_days_do_not_move_the_watermark(workdir):
+    fetch_weather_data(end_date="1943-06-30", client=SyntheticClient(end_date=END_DATE))
+    lagging = LaggingClient("1943-09-30", end_date=END_DATE)
+    fetch_weather_data(incremental=True, end_date=END_DATE, client=lagging)
+    assert latest_date(HISTORY_TABLE) == pd.Timestamp("1943-09-30", tz="UTC")
+    assert read_table(HISTORY_TABLE)[DAILY_VARIABLES].notna().any(axis=1).all()
+
+    # Once the archive catches up, the missing days are fetched
+    fetch_weather_data(incremental=True, end_date=END_DATE, client=SyntheticClient(end_date=END_DATE))
+    assert latest_date(HISTORY_TABLE) == pd.Timestamp(END_DATE, tz="UTC")
+    assert len(read_table(HISTORY_TABLE)) == (pd.Timestamp(END_DATE) - pd.Timestamp(HISTORY_START)).days + 1
+
+
+# ---------- Multi-station fetch ----------
+STATIONS_SUBSET = dict(list(STATIONS.items())[:5])
+
+
+def test_concurrent_station_fetch_matches_sequential(workdir):
+    kwargs = {"start_date": "1942-01-01", "end_date": END_DATE, "table": None}
+    concurrent = fetch_stations(STATIONS_SUBSET, max_workers=4, client=SyntheticClient(end_date=END_DATE), **kwargs)
+    sequential = fetch_stations(STATIONS_SUBSET, max_workers=1, client=SyntheticClient(end_date=END_DATE), **kwargs)
+    pd.testing.assert_frame_equal(concurrent, sequential)
+    # Every station has its own series
+    assert concurrent.groupby("station")["temperature_2m_mean"].first().nunique() == len(STATIONS_SUBSET)
+
+
+def test_incremental_station_fetch_is_per_station(workdir):
+    client = SyntheticClient(end_date=END_DATE)
+    first = dict(list(STATIONS_SUBSET.items())[:3])
+    fetch_stations(first, start_date="1942-01-01", end_date="1943-06-30", max_workers=4, client=client)
+
+    # Known stations continue from their own watermark; a new one starts from the beginning
+    new_rows = fetch_stations(STATIONS_SUBSET, start_date="1942-01-01", end_date=END_DATE, max_workers=4,
+                              client=client, incremental=True)
+    starts = new_rows.groupby("station")["date"].min()
+    for station in STATIONS_SUBSET:
+        expected = "1943-07-01" if station in first else "1942-01-01"
+        assert starts[station] == pd.Timestamp(expected, tz="UTC")
+
+    calls = client.calls
+    assert fetch_stations(STATIONS_SUBSET, start_date="1942-01-01", end_date=END_DATE, client=client,
+                          incremental=True).empty
+    assert client.calls == calls
+
+    stored = read_table(STATIONS_TABLE)
+    full = fetch_stations(STATIONS_SUBSET, start_date="1942-01-01", end_date=END_DATE, max_workers=4,
+                          client=client, table=None)
+    pd.testing.assert_frame_equal(stored, full.assign(date=full["date"].dt.as_unit("ns")))
@@ -0,0 +1,25 @@
+# tests/test_forecast.py
+
+import numpy as np
+from features import LAG_FEATURES, feature_names, history_days
+from forecast import forecast
+
+
+class _Constant:
+    # Predicts the same value for every row
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+def test_precipitation_is_never_negative():
+    models = {"temperature": _Constant(27.0), "precipitation": _Constant(-3.0), "weather_code": _Constant(3)}
+    windows = np.ones((2, len(LAG_FEATURES), history_days()), dtype=np.float32)
+    preds = forecast(models, feature_names(), windows, horizon=3)
+
+    assert (preds["precipitation"] == 0).all()
+    # The clipped value, not the raw prediction, is fed back into the window
+    rain = LAG_FEATURES.index("precipitation_sum")
+    assert (windows[:, rain, :3] == 0).all()
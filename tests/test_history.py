@@ -0,0 +1,24 @@
+# tests/test_history.py
+
+import pandas as pd
+from history import History
+from synthetic import synthetic_history
+
+
+def test_station_lookups_cover_the_whole_history():
+    history = synthetic_history(scale=3, years=4)
+    # Year-major order, as partitions concatenated by year would give
+    shuffled = history.sort_values(["date", "station"], ignore_index=True)
+    index = History(shuffled)
+
+    kollam = history[history["station"] == "kollam"].reset_index(drop=True)
+    start, end = index.spans["kollam"]
+    assert end - start == len(kollam)
+
+    row = index.row("1942-06-01", "kollam")
+    assert len(row) == 1 and row["date"].iloc[0] == pd.Timestamp("1942-06-01", tz="UTC")
+    assert row["temperature_2m_mean"].iloc[0] == kollam.loc[kollam["date"] == "1942-06-01", "temperature_2m_mean"].iloc[0]
+
+    rows = index.range("1941-01-01", "1943-12-31", "kollam")
+    assert len(rows) == ((kollam["date"] >= "1941-01-01") & (kollam["date"] <= "1943-12-31")).sum()
+    assert rows["date"].is_monotonic_increasing
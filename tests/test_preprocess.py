@@ -0,0 +1,27 @@
+# tests/test_preprocess.py
+
+import pandas as pd
+from preprocess import preprocess_weather_data
+from store import FEATURES_TABLE, HISTORY_TABLE, append_table, read_table, write_table
+from synthetic import synthetic_history
+
+NEW_DAYS = 10
+
+
+def test_incremental_run_matches_full_rebuild(workdir):
+    history = synthetic_history(years=1)
+
+    # Nightly path: full preprocess, then only the newly fetched days
+    write_table(history.iloc[:-NEW_DAYS], HISTORY_TABLE)
+    preprocess_weather_data()
+    append_table(history.iloc[-NEW_DAYS:], HISTORY_TABLE)
+    preprocess_weather_data(incremental=True)
+    incremental = read_table(FEATURES_TABLE)
+
+    # Same history preprocessed in one go
+    write_table(history, HISTORY_TABLE)
+    preprocess_weather_data(output_table="features_full", state_path="full_state.pkl")
+    full = read_table("features_full")
+
+    assert incremental["date"].max() == history["date"].max()
+    pd.testing.assert_frame_equal(incremental, full)
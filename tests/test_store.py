@@ -0,0 +1,32 @@
+# tests/test_store.py
+
+import pandas as pd
+from store import append_table, read_table, write_table
+from synthetic import synthetic_history
+
+
+def test_multi_station_round_trip_is_station_major(workdir):
+    # Three stations over several year partitions come back ordered by (station, date)
+    history = synthetic_history(scale=3, years=3)
+    write_table(history, "stations")
+
+    stored = read_table("stations")
+    expected = history.assign(date=history["date"].dt.as_unit("ns")).sort_values(["station", "date"], ignore_index=True)
+    pd.testing.assert_frame_equal(stored, expected)
+
+    # Column pruning and date ranges keep the same order
+    pruned = read_table("stations", columns=["date", "temperature_2m_mean"], start="1941-06-01")
+    rows = expected[expected["date"] >= pd.Timestamp("1941-06-01", tz="UTC")]
+    pd.testing.assert_frame_equal(pruned, rows[["date", "temperature_2m_mean"]].reset_index(drop=True))
+
+
+def test_append_keeps_station_major_order(workdir):
+    history = synthetic_history(scale=2, years=2)
+    latest = history["date"].max() - pd.Timedelta(days=5)
+    write_table(history[history["date"] <= latest], "stations")
+    append_table(history[history["date"] > latest], "stations")
+
+    stored = read_table("stations")
+    assert stored[["station", "date"]].equals(
+        stored[["station", "date"]].sort_values(["station", "date"], ignore_index=True))
+    assert len(stored) == len(history)
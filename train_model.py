@@ -1,63 +1,198 @@
 # train_models.py
 
+import multiprocessing
+import os
+import time
 import pandas as pd
 import joblib
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, accuracy_score
-from sklearn.utils.class_weight import compute_class_weight
 import numpy as np
+from artifacts import export_models, is_forest
+from features import feature_names
+from manifest import file_digest, record
+from metrics import instrumented, set_rows
+from registry import DEFAULT_BACKEND, balanced_class_weights, make_model, selected_backend
+from store import FEATURES_TABLE, read_table
 
-def train_models():
-    df = pd.read_csv("preprocessed_weather.csv")
+# Model name -> (target column, artifact path)
+MODELS = {
+    "temperature": ("temperature_2m_mean", "model_temperature.pkl"),
+    "precipitation": ("precipitation_sum", "model_precipitation.pkl"),
+    "weather_code": ("weather_code", "model_weather_code.pkl"),
+}
+FEATURES_PATH = "features.pkl"
+
+# Date of the newest row the saved models have seen, used by warm-start training
+TRAIN_STATE_PATH = "train_state.pkl"
+
+# Warm start: trees added per run, how far back they look, and when to refit from scratch
+EXTRA_TREES = 20
+RECENT_DAYS = 365
+MAX_TREES = 300
+
+
+def new_model(name, y_train, n_jobs=None, backend=None):
+    # The backend chosen by registry.py (random forest until one has been selected)
+    return make_model(name, backend or selected_backend(name), y_train, n_jobs)
+
+
+def score_model(name, model, X, y):
+    preds = model.predict(X)
+    if name == "weather_code":
+        return accuracy_score(y, preds)
+    return mean_squared_error(y, preds) ** 0.5
+
+
+def print_score(name, score, suffix=""):
+    if name == "temperature":
+        print(f"🌡️ Temperature RMSE: {score:.2f}{suffix}")
+    elif name == "precipitation":
+        print(f"🌧️ Precipitation RMSE: {score:.2f}{suffix}")
+    else:
+        print(f"⛅ Weather Code Accuracy: {score * 100:.2f}%{suffix}")
+
+
+def fit_model(name, model, X_train, y_train, X_test, y_test):
+    # Runs in a worker process; returns the fitted model, its score and fit time
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    seconds = time.perf_counter() - start
+    score = score_model(name, model, X_test, y_test) if len(y_test) > 0 else None
+    return model, score, seconds
+
+
+def warm_start_model(name, model, X_recent, y_recent, extra_trees=EXTRA_TREES, max_trees=MAX_TREES):
+    # Add trees trained on recent rows to an existing forest; None if it needs a full refit
+    if not is_forest(model) or model.n_estimators + extra_trees > max_trees:
+        return None
+    if name == "weather_code":
+        # New trees must see exactly the classes the forest already predicts
+        if not np.array_equal(np.unique(y_recent), model.classes_):
+            return None
+        model.set_params(class_weight=balanced_class_weights(y_recent))
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees)
+    return model
+
+
+def pool_context():
+    # Pools are started from pipeline threads while other stages run. A forked worker
+    # could inherit a lock (e.g. metrics) held by one of those threads and hang, so
+    # workers start from a clean forkserver process (spawn where there is none).
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def run_fits(jobs, max_workers):
+    # jobs: name -> fit_model arguments; fits run concurrently in a process pool
+    results = {}
+    if max_workers <= 1:
+        for name, args in jobs.items():
+            results[name] = fit_model(name, *args)
+        return results
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context()) as pool:
+        futures = {name: pool.submit(fit_model, name, *args) for name, args in jobs.items()}
+        for name, future in futures.items():
+            results[name] = future.result()
+    return results
+
+
+def load_training_data():
+    df = read_table(FEATURES_TABLE)
 
     # Drop NA (in case)
     df.dropna(inplace=True)
 
-    # Input features
-    feature_cols = [col for col in df.columns if ("lag" in col and "description" not in col)] 
-    X = df[feature_cols]
+    # One feature matrix shared by all three models
+    feature_cols = [col for col in feature_names() if col in df.columns]
+    X = df[feature_cols].to_numpy(dtype=np.float32)
+    targets = {name: df[target].to_numpy() for name, (target, _) in MODELS.items()}
+    return df, feature_cols, X, targets
+
+
+def split_rows(n_rows):
+    # Train-test split of row positions
+    return train_test_split(np.arange(n_rows), test_size=0.2, random_state=42)
+
 
-    # Targets
-    y_temp = df["temperature_2m_mean"]
-    y_precip = df["precipitation_sum"]
-    y_weather_code = df["weather_code"]
+def worker_counts(max_workers=None, n_jobs=None):
+    # Split the cores between the models fitted side by side
+    cpus = os.cpu_count() or 1
+    max_workers = max_workers or min(len(MODELS), cpus)
+    n_jobs = n_jobs or max(1, cpus // max_workers)
+    return max_workers, n_jobs
+
+
+def save_models(models, feature_cols, last_date, backends=None):
+    # Pickles, compact exports and training state; a new manifest version makes the
+    # dashboard and the API reload them
+    backends = backends or {name: selected_backend(name) for name in models}
+    for name, model in models.items():
+        joblib.dump(model, MODELS[name][1])
+    joblib.dump(feature_cols, FEATURES_PATH)
+    joblib.dump({"last_date": last_date, "backends": backends}, TRAIN_STATE_PATH)
+    export_models(models)
+    record("models", file_digest([path for _, path in MODELS.values()] + [FEATURES_PATH]))
+
+
+@instrumented("train")
+def train_models(warm_start=False, n_jobs=None, max_workers=None, extra_trees=EXTRA_TREES,
+                 recent_days=RECENT_DAYS):
+    total_start = time.perf_counter()
+    df, feature_cols, X, targets = load_training_data()
+    set_rows(len(X))
+    max_workers, n_jobs = worker_counts(max_workers, n_jobs)
+    backends = {name: selected_backend(name) for name in MODELS}
+
+    state = joblib.load(TRAIN_STATE_PATH) if os.path.exists(TRAIN_STATE_PATH) else None
+    jobs = {}
+    if warm_start and state is not None and joblib.load(FEATURES_PATH) == feature_cols:
+        new_rows = (df["date"] > state["last_date"]).to_numpy()
+        if not new_rows.any():
+            print(f"✅ Models already trained on data up to {state['last_date'].date()}")
+            return
+        recent = (df["date"] > df["date"].max() - pd.Timedelta(days=recent_days)).to_numpy()
+
+        for name, (_, path) in MODELS.items():
+            model = joblib.load(path)
+            # Out-of-sample check of the current model on the rows it has not seen yet
+            print_score(name, score_model(name, model, X[new_rows], targets[name][new_rows]),
+                        f" on {new_rows.sum()} new rows (before update)")
+            if state.get("backends", {}).get(name, DEFAULT_BACKEND) != backends[name]:
+                model = None  # a different backend was selected since the last run
+            else:
+                model = warm_start_model(name, model, X[recent], targets[name][recent], extra_trees)
+            if model is not None:
+                model.set_params(n_jobs=n_jobs)
+                jobs[name] = (model, X[recent], targets[name][recent], X[:0], targets[name][:0])
+            else:
+                print(f"↻ {name}: full refit")
 
     # Train-test split
-    X_train, X_test, y_temp_train, y_temp_test = train_test_split(X, y_temp, test_size=0.2, random_state=42)
-    _, _, y_precip_train, y_precip_test = train_test_split(X, y_precip, test_size=0.2, random_state=42)
-    _, _, y_code_train, y_code_test = train_test_split(X, y_weather_code, test_size=0.2, random_state=42)
-
-    # 1. Temperature Model
-    model_temp = RandomForestRegressor(random_state=42)
-    model_temp.fit(X_train, y_temp_train)
-    preds_temp = model_temp.predict(X_test)
-    temp_rmse = mean_squared_error(y_temp_test, preds_temp) ** 0.5
-    print(f"🌡️ Temperature RMSE: {temp_rmse:.2f}")
-
-    # 2. Precipitation Model
-    model_precip = RandomForestRegressor(random_state=42)
-    model_precip.fit(X_train, y_precip_train)
-    preds_precip = model_precip.predict(X_test)
-    precip_rmse = mean_squared_error(y_precip_test, preds_precip) ** 0.5
-    print(f"🌧️ Precipitation RMSE: {precip_rmse:.2f}")
-
-    # 3. Weather Code Classifier (with class weights)
-    class_weights = compute_class_weight(class_weight="balanced", classes=np.unique(y_code_train), y=y_code_train)
-    weights_dict = {cls: w for cls, w in zip(np.unique(y_code_train), class_weights)}
-
-    model_code = RandomForestClassifier(random_state=42, class_weight=weights_dict)
-    model_code.fit(X_train, y_code_train)
-    preds_code = model_code.predict(X_test)
-    print(f"⛅ Weather Code Accuracy: {accuracy_score(y_code_test, preds_code) * 100:.2f}%")
+    full_refit = [name for name in MODELS if name not in jobs]
+    if len(full_refit) > 0:
+        train_idx, test_idx = split_rows(len(X))
+        X_train, X_test = X[train_idx], X[test_idx]
+        for name in full_refit:
+            y = targets[name]
+            model = new_model(name, y[train_idx], n_jobs=n_jobs, backend=backends[name])
+            jobs[name] = (model, X_train, y[train_idx], X_test, y[test_idx])
+
+    results = run_fits(jobs, max_workers)
+    for name, (model, score, seconds) in results.items():
+        if score is not None:
+            print_score(name, score)
+        size = f"{model.n_estimators} trees" if is_forest(model) else backends[name]
+        print(f"⏱️ {name}: {size}, fit in {seconds:.1f}s")
 
     # Save
-    joblib.dump(model_temp, "model_temperature.pkl")
-    joblib.dump(model_precip, "model_precipitation.pkl")
-    joblib.dump(model_code, "model_weather_code.pkl")
-    joblib.dump(X.columns.tolist(), "features.pkl")
+    save_models({name: model for name, (model, _, _) in results.items()}, feature_cols, df["date"].max(), backends)
 
+    print(f"⏱️ Total training time: {time.perf_counter() - total_start:.1f}s "
+          f"({max_workers} process(es) x {n_jobs} job(s))")
     print("✅ All models trained and saved successfully.")
 
 if __name__ == "__main__":
-    train_models()
+    import sys
+    train_models(warm_start="--warm-start" in sys.argv)